@@ -0,0 +1,6 @@
+"""
+Offline benchmark suite.
+Measures our own overhead on the request paths by swapping the upstream APIs
+(Groq, Google embeddings, Pinecone) for deterministic fakes. Run from the
+server directory with ``python -m benchmarks.run``.
+"""
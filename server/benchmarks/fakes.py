@@ -0,0 +1,215 @@
+"""
+Deterministic stand-ins for the upstream APIs.
+Replace ChatGroq, GoogleGenerativeAIEmbeddings and the Pinecone index with local
+fakes that sleep for a configurable latency, and record how much simulated
+upstream time each operation spent so the remainder can be attributed to our
+own code.
+"""
+
+import asyncio
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_WORD_RE = re.compile(r"\w+")
+
+DEFAULT_RESPONSE = (
+    "Our clinic is open Monday through Friday from 9:00 AM to 7:00 PM and Saturdays "
+    "from 10:00 AM to 4:00 PM. We are closed on Sundays and major holidays."
+)
+
+
+@dataclass
+class UpstreamProfile:
+    """Simulated upstream latencies (seconds) and LLM throughput."""
+
+    embed_latency: float = 0.05  # per embedding request
+    embed_per_text: float = 0.001  # added per text in a batch request
+    index_latency: float = 0.03  # per vector index call
+    llm_first_token: float = 0.25  # time to first token
+    llm_token_rate: float = 200.0  # tokens per second after the first
+    response: str = DEFAULT_RESPONSE
+
+
+class UpstreamClock:
+    """Thread-safe accumulator of simulated upstream time."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._total = 0.0
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._total += seconds
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+            self.add(seconds)
+
+    async def asleep(self, seconds: float):
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+            self.add(seconds)
+
+    def reset(self) -> float:
+        """Return the accumulated time and start over."""
+        with self._lock:
+            total, self._total = self._total, 0.0
+        return total
+
+
+CLOCK = UpstreamClock()
+
+
+def fake_vector(text: str, dimension: int) -> List[float]:
+    """Deterministic bag-of-words hash embedding (similar texts get similar vectors)."""
+    vector = [0.0] * dimension
+    for word in _WORD_RE.findall(text.lower()):
+        vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % dimension] += 1.0
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm + 1e-6 for v in vector]
+
+
+class FakeEmbeddings(Embeddings):
+    """Stand-in for GoogleGenerativeAIEmbeddings."""
+
+    def __init__(self, profile: UpstreamProfile, dimension: int, clock: UpstreamClock = CLOCK):
+        self.profile = profile
+        self.dimension = dimension
+        self.clock = clock
+
+    def _latency(self, count: int) -> float:
+        return self.profile.embed_latency + self.profile.embed_per_text * count
+
+    def embed_query(self, text: str, task_type: Optional[str] = None) -> List[float]:
+        self.clock.sleep(self._latency(1))
+        return fake_vector(text, self.dimension)
+
+    def embed_documents(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        self.clock.sleep(self._latency(len(texts)))
+        return [fake_vector(text, self.dimension) for text in texts]
+
+    async def aembed_query(self, text: str, task_type: Optional[str] = None) -> List[float]:
+        await self.clock.asleep(self._latency(1))
+        return fake_vector(text, self.dimension)
+
+    async def aembed_documents(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        await self.clock.asleep(self._latency(len(texts)))
+        return [fake_vector(text, self.dimension) for text in texts]
+
+
+class FakeChatModel(BaseChatModel):
+    """Stand-in for ChatGroq with a fixed time to first token and token rate."""
+
+    profile: UpstreamProfile
+    clock: Any = CLOCK
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-groq"
+
+    def _tokens(self) -> List[str]:
+        words = self.profile.response.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.profile.llm_token_rate if self.profile.llm_token_rate > 0 else 0.0
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._tokens()
+        self.clock.sleep(self.profile.llm_first_token + self._token_delay() * (len(tokens) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._tokens()
+        await self.clock.asleep(self.profile.llm_first_token + self._token_delay() * (len(tokens) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for i, token in enumerate(self._tokens()):
+            self.clock.sleep(self.profile.llm_first_token if i == 0 else self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for i, token in enumerate(self._tokens()):
+            await self.clock.asleep(self.profile.llm_first_token if i == 0 else self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class FakeIndex:
+    """
+    Stand-in for a Pinecone index: delegates to an in-process LocalVectorIndex
+    after sleeping for the simulated network round-trip.
+    """
+
+    _CALLS = ("query", "upsert", "fetch", "delete", "update", "describe_index_stats")
+
+    def __init__(self, inner: Any, profile: UpstreamProfile, clock: UpstreamClock = CLOCK):
+        self._inner = inner
+        self._profile = profile
+        self._clock = clock
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._inner, name)
+        if name not in self._CALLS:
+            return attr
+
+        def call(*args, **kwargs):
+            self._clock.sleep(self._profile.index_latency)
+            return attr(*args, **kwargs)
+
+        return call
+
+
+def install_fakes(profile: UpstreamProfile):
+    """
+    Point the shared services at the fakes.
+
+    Expects ``settings.VECTOR_BACKEND`` to be "local" so the fake index can
+    wrap an in-process LocalVectorIndex.
+    """
+    from config import settings
+    from services.llm_service import get_llm_service
+    from services.vectorstore_service import get_vectorstore_service
+
+    vectorstore = get_vectorstore_service()
+    vectorstore._embed_model = FakeEmbeddings(profile, settings.EMBEDDING_DIMENSION)
+    vectorstore._index = FakeIndex(vectorstore.index, profile)
+
+    llm_service = get_llm_service()
+    fake_llm = FakeChatModel(profile=profile)
+    llm_service.get_llm = lambda *args, **kwargs: fake_llm
@@ -0,0 +1,341 @@
+"""
+Offline micro-benchmark runner.
+
+Runs the request paths against the fakes in benchmarks.fakes and reports, per
+benchmark, the wall time and the part of it that was *not* simulated upstream
+latency (our overhead). Results are written as JSON so runs can be compared
+across commits:
+
+    cd server
+    python -m benchmarks.run --output .cache/benchmarks/before.json
+    python -m benchmarks.run --compare .cache/benchmarks/before.json
+"""
+
+import os
+
+# Settings require the API keys; the fakes never use them
+for _key in ("GOOGLE_API_KEY", "GROQ_API_KEY", "PINECONE_API_KEY", "PINECONE_INDEX_NAME"):
+    os.environ.setdefault(_key, "benchmark")
+
+import argparse
+import itertools
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from config import settings
+from logger import logger
+from benchmarks.fakes import CLOCK, UpstreamProfile, install_fakes
+
+DEFAULT_OUTPUT_DIR = Path(__file__).parent.parent / ".cache" / "benchmarks"
+
+# Made unique per call (see _question) so no cache or coalescing shortcut skews results
+QUESTIONS = [
+    "Is laser hair removal safe for darker skin tones?",
+    "How long do results from fillers usually last?",
+    "Can I reschedule a consultation online?",
+    "What should I avoid before a chemical peel?",
+    "Are your injectors board certified?",
+]
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[int], Any]]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark; the decorated function does setup and returns the timed callable."""
+    def register(setup: Callable[[], Callable[[int], Any]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+_calls = itertools.count()
+
+
+def _question(i: int) -> str:
+    return f"{QUESTIONS[i % len(QUESTIONS)]} (ref {next(_calls)})"
+
+
+# faq_loader
+
+@benchmark("faq_loader.load_faqs_from_json (reparse)")
+def _faq_reparse():
+    from modules.faq_loader import get_faq_catalog, load_faqs_from_json
+    catalog = get_faq_catalog()
+
+    def run(i):
+        catalog._snapshot = None
+        return load_faqs_from_json()
+    return run
+
+
+@benchmark("faq_loader.load_faqs_from_json (cached)")
+def _faq_cached():
+    from modules.faq_loader import load_faqs_from_json
+    return lambda i: load_faqs_from_json()
+
+
+@benchmark("faq_loader.get_faq_by_id")
+def _faq_by_id():
+    from modules.faq_loader import get_faq_by_id
+    return lambda i: get_faq_by_id("faq_005")
+
+
+# Vector store
+
+@benchmark("VectorStoreService.query")
+def _vector_query():
+    from services.vectorstore_service import get_vectorstore_service
+    vectorstore = get_vectorstore_service()
+    return lambda i: vectorstore.query(_question(i), top_k=settings.RETRIEVAL_FETCH_K)
+
+
+@benchmark("VectorStoreService.upsert_documents (full)")
+def _upsert_full():
+    from modules.faq_loader import load_faqs_from_json
+    from services.vectorstore_service import get_vectorstore_service
+    vectorstore = get_vectorstore_service()
+    documents = load_faqs_from_json()
+    return lambda i: vectorstore.upsert_documents(documents, id_prefix="bench", force=True)
+
+
+@benchmark("VectorStoreService.upsert_documents (unchanged)")
+def _upsert_unchanged():
+    from modules.faq_loader import load_faqs_from_json
+    from services.vectorstore_service import get_vectorstore_service
+    vectorstore = get_vectorstore_service()
+    documents = load_faqs_from_json()
+    vectorstore.upsert_documents(documents, id_prefix="bench")
+    return lambda i: vectorstore.upsert_documents(documents, id_prefix="bench")
+
+
+# Agent / pipeline
+
+@benchmark("SimpleRAGAgent.invoke")
+def _agent_invoke():
+    from langchain_core.messages import HumanMessage
+    from modules.llm import get_llm_agent
+    agent = get_llm_agent()
+    return lambda i: agent.invoke({"messages": [HumanMessage(content=_question(i))]})
+
+
+@benchmark("query_agent")
+def _query_agent():
+    from modules.llm import get_llm_agent
+    from modules.query_handlers import query_agent
+    agent = get_llm_agent()
+    return lambda i: query_agent(agent, _question(i))
+
+
+@benchmark("RAGPipeline.answer")
+def _pipeline_answer():
+    from modules.rag_pipeline import get_rag_pipeline
+    pipeline = get_rag_pipeline()
+    return lambda i: pipeline.answer(_question(i))
+
+
+@benchmark("RAGPipeline.answer_batch (5 questions)")
+def _pipeline_answer_batch():
+    from modules.rag_pipeline import get_rag_pipeline
+    pipeline = get_rag_pipeline()
+    # One embed_documents call for the batch; retrieval reuses the vectors. Run
+    # serially so the summed upstream time is comparable to the wall time.
+    return lambda i: list(pipeline.answer_batch([_question(i) for _ in QUESTIONS], max_concurrency=1))
+
+
+# Routes
+
+@benchmark("flask POST /ask")
+def _flask_ask():
+    from flask_app import app
+    client = app.test_client()
+    return lambda i: client.post("/ask", json={"question": _question(i)}).get_json()
+
+
+@benchmark("flask POST /ask/stream")
+def _flask_ask_stream():
+    from flask_app import app
+    client = app.test_client()
+    return lambda i: client.post("/ask/stream", json={"question": _question(i)}).get_data()
+
+
+@benchmark("flask POST /groq_stream")
+def _flask_groq_stream():
+    from flask_app import app
+    client = app.test_client()
+    return lambda i: client.post(
+        "/groq_stream", data={"question": _question(i), "thread_id": f"bench-{i}"}
+    ).get_data()
+
+
+def _fastapi_client():
+    from fastapi.testclient import TestClient
+    from main import app
+    return TestClient(app)
+
+
+@benchmark("fastapi POST /ask/")
+def _fastapi_ask():
+    client = _fastapi_client()
+    return lambda i: client.post("/ask/", data={"question": _question(i)}).json()
+
+
+@benchmark("fastapi POST /ask/stream")
+def _fastapi_ask_stream():
+    client = _fastapi_client()
+    return lambda i: client.post("/ask/stream", data={"question": _question(i)}).content
+
+
+@benchmark("fastapi POST /groq_stream/")
+def _fastapi_groq_stream():
+    client = _fastapi_client()
+    return lambda i: client.post(
+        "/groq_stream/", data={"question": _question(i), "thread_id": f"bench-{i}"}
+    ).content
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_benchmark(name: str, iterations: int, warmup: int) -> Dict[str, Any]:
+    """Time one benchmark and split each iteration into upstream and overhead time."""
+    func = BENCHMARKS[name]()
+    for i in range(warmup):
+        func(i)
+
+    wall: List[float] = []
+    upstream: List[float] = []
+    for i in range(iterations):
+        CLOCK.reset()
+        started = time.perf_counter()
+        func(i)
+        wall.append(time.perf_counter() - started)
+        upstream.append(CLOCK.reset())
+
+    overhead = [w - u for w, u in zip(wall, upstream)]
+    ms = 1000.0
+    return {
+        "name": name,
+        "iterations": iterations,
+        "mean_ms": statistics.mean(wall) * ms,
+        "p50_ms": _percentile(wall, 50) * ms,
+        "p95_ms": _percentile(wall, 95) * ms,
+        "min_ms": min(wall) * ms,
+        "upstream_ms": statistics.mean(upstream) * ms,
+        "overhead_ms": statistics.mean(overhead) * ms,
+        "overhead_p95_ms": _percentile(overhead, 95) * ms,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _configure(workdir: Path):
+    """Isolate the run: local index in a temp dir, answer shortcuts off, no warm-up."""
+    settings.VECTOR_BACKEND = "local"
+    settings.LOCAL_INDEX_PATH = str(workdir / "index")
+    settings.INGEST_MANIFEST_PATH = str(workdir / "ingest_manifest.json")
+    settings.EMBEDDING_CACHE_PATH = None
+    settings.ANSWER_CACHE_SIZE = 0
+    settings.FAQ_DIRECT_ANSWERS = False
+    settings.WARMUP_ON_STARTUP = False
+    settings.STREAM_FLUSH_INTERVAL = 0.0
+
+
+def _print_table(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]]):
+    header = f"{'benchmark':<52} {'mean ms':>9} {'p95 ms':>9} {'upstream':>9} {'overhead':>9}"
+    if baseline:
+        header += f" {'Δ overhead':>11}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        line = (
+            f"{result['name']:<52} {result['mean_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+            f"{result['upstream_ms']:>9.2f} {result['overhead_ms']:>9.2f}"
+        )
+        previous = (baseline or {}).get(result["name"])
+        if previous:
+            line += f" {result['overhead_ms'] - previous['overhead_ms']:>+11.2f}"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks with fake Groq, embeddings and Pinecone")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--only", help="Run benchmarks whose name contains this text")
+    parser.add_argument("--output", help="Results JSON path (default: .cache/benchmarks/<commit>.json)")
+    parser.add_argument("--compare", help="Baseline results JSON to diff overhead against")
+    parser.add_argument("--embed-latency", type=float, default=50.0, help="ms per embedding request")
+    parser.add_argument("--index-latency", type=float, default=30.0, help="ms per vector index call")
+    parser.add_argument("--llm-first-token", type=float, default=250.0, help="ms to first LLM token")
+    parser.add_argument("--llm-token-rate", type=float, default=200.0, help="LLM tokens per second")
+    args = parser.parse_args(argv)
+
+    logger.setLevel(logging.WARNING)
+    profile = UpstreamProfile(
+        embed_latency=args.embed_latency / 1000,
+        index_latency=args.index_latency / 1000,
+        llm_first_token=args.llm_first_token / 1000,
+        llm_token_rate=args.llm_token_rate,
+    )
+
+    with tempfile.TemporaryDirectory(prefix="clinic-bench-") as workdir:
+        _configure(Path(workdir))
+        install_fakes(profile)
+
+        # Seed the index with the FAQ catalog
+        from modules.faq_loader import sync_faq_index
+        sync_faq_index()
+
+        names = [name for name in BENCHMARKS if not args.only or args.only in name]
+        results = []
+        for name in names:
+            results.append(run_benchmark(name, args.iterations, args.warmup))
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "profile": {
+            "embed_latency_ms": args.embed_latency,
+            "index_latency_ms": args.index_latency,
+            "llm_first_token_ms": args.llm_first_token,
+            "llm_token_rate": args.llm_token_rate,
+        },
+        "results": results,
+    }
+
+    output = Path(args.output) if args.output else DEFAULT_OUTPUT_DIR / f"{commit or 'results'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    baseline = None
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text())
+        baseline = {result["name"]: result for result in previous["results"]}
+    _print_table(results, baseline)
+    print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
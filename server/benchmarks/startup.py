@@ -0,0 +1,132 @@
+"""
+Cold-start profile and import-time budget.
+
+Imports each app entry point in fresh interpreters and reports the best wall
+time, the packages that import time is spent in (from ``python -X importtime``)
+and what the modules deferred to first use / warm-up cost. Exits non-zero when
+an entry point takes longer than the budget to import, so CI can catch a heavy
+module creeping back into the import path:
+
+    cd server
+    python -m benchmarks.startup
+    python -m benchmarks.startup --budget-ms 800
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+SERVER_DIR = Path(__file__).parent.parent
+
+ENTRY_POINTS = ("flask_app", "main")
+
+# Imported on first use or during warm-up rather than at import time
+DEFERRED_IMPORTS = (
+    "from langchain_groq import ChatGroq",
+    "from langchain_google_genai import GoogleGenerativeAIEmbeddings",
+    "from pinecone import Pinecone",
+    "from langchain_community.document_loaders import PyPDFLoader",
+)
+
+DEFAULT_BUDGET_MS = 1000.0
+
+
+def _env() -> Dict[str, str]:
+    # Settings require the API keys; nothing here calls the upstream APIs
+    env = dict(os.environ)
+    for key in ("GOOGLE_API_KEY", "GROQ_API_KEY", "PINECONE_API_KEY", "PINECONE_INDEX_NAME"):
+        env.setdefault(key, "benchmark")
+    return env
+
+
+def _python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        capture_output=True, text=True, cwd=SERVER_DIR, env=_env(), check=True
+    )
+
+
+def import_time(module: str, runs: int) -> float:
+    """Best-of-``runs`` seconds to import ``module`` in a fresh interpreter."""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    return min(float(_python(code).stdout.strip()) for _ in range(runs))
+
+
+def import_profile(module: str) -> List[Tuple[str, float]]:
+    """Self import time per top-level package, in seconds, largest first."""
+    stderr = _python(f"import {module}", "-X", "importtime").stderr
+    totals: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        totals[name.strip().split(".")[0]] += int(self_us) / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def deferred_cost(entry_point: str, statement: str) -> Optional[float]:
+    """Seconds a deferred import adds on first use once the app is imported (None if missing)."""
+    code = (
+        f"import time, {entry_point}; t = time.perf_counter(); "
+        f"{statement}; print(time.perf_counter() - t)"
+    )
+    try:
+        return float(_python(code).stdout.strip())
+    except subprocess.CalledProcessError:
+        return None
+
+
+def _missing_module(error: subprocess.CalledProcessError) -> Optional[str]:
+    """Name of the module an import failed on for not being installed, if that was the cause."""
+    match = re.search(r"ModuleNotFoundError: No module named '([^']+)'", error.stderr or "")
+    return match.group(1) if match else None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Profile app import time and enforce an import budget")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per entry point (best is kept)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="0 disables the check")
+    parser.add_argument("--top", type=int, default=10, help="packages listed per entry point")
+    args = parser.parse_args(argv)
+
+    over_budget = []
+    for entry_point in ENTRY_POINTS:
+        # main (FastAPI) is development only; its framework is not in requirements.txt
+        try:
+            elapsed_ms = import_time(entry_point, args.runs) * 1000
+        except subprocess.CalledProcessError as error:
+            missing = _missing_module(error)
+            if missing is None:
+                raise
+            print(f"import {entry_point}: skipped ({missing} is not installed)\n")
+            continue
+        status = ""
+        if args.budget_ms and elapsed_ms > args.budget_ms:
+            over_budget.append(entry_point)
+            status = f"  OVER BUDGET ({args.budget_ms:.0f} ms)"
+        print(f"import {entry_point}: {elapsed_ms:.0f} ms{status}")
+        for package, seconds in import_profile(entry_point)[:args.top]:
+            print(f"  {package:<40} {seconds * 1000:>8.1f} ms")
+        print()
+
+    print("Deferred to first use / warm-up (after import flask_app):")
+    for statement in DEFERRED_IMPORTS:
+        seconds = deferred_cost(ENTRY_POINTS[0], statement)
+        cost = "not installed" if seconds is None else f"{seconds * 1000:.1f} ms"
+        print(f"  {statement:<64} {cost:>13}")
+
+    if over_budget:
+        print(f"\nImport budget exceeded by: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
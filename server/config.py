@@ -6,7 +6,7 @@ All environment variables and application settings are defined here.
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -21,14 +21,124 @@ class Settings(BaseSettings):
     PINECONE_ENV: str = "us-east-1"
     PINECONE_INDEX_NAME: str
     
+    # Vector Store Backend ("pinecone" or "local" in-process NumPy index)
+    VECTOR_BACKEND: str = "pinecone"
+    LOCAL_INDEX_PATH: str = str(Path(__file__).parent / ".cache" / "local_index")
+    LOCAL_INDEX_ANN: bool = False
+    LOCAL_INDEX_ANN_MIN_SIZE: int = 10000
+    LOCAL_INDEX_NPROBE: int = 8
+    
     # Model Configuration
     EMBEDDING_MODEL: str = "models/embedding-001"
     EMBEDDING_DIMENSION: int = 768
     LLM_MODEL: str = "llama-3.3-70b-versatile"
     
+    # LLM HTTP Connection Pool (shared by all cached ChatGroq clients)
+    LLM_POOL_MAX_CONNECTIONS: int = 20
+    LLM_POOL_MAX_KEEPALIVE: int = 10
+    LLM_KEEPALIVE_EXPIRY: float = 30.0  # seconds an idle connection is kept open
+    LLM_TIMEOUT: float = 60.0  # seconds per request (read/write/pool)
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_MAX_RETRIES: int = 2
+    
+    # Query Embedding Cache (size 0 disables; TTL in seconds, 0 = no expiry)
+    EMBEDDING_CACHE_SIZE: int = 2048
+    EMBEDDING_CACHE_TTL: int = 86400
+    EMBEDDING_CACHE_PATH: Optional[str] = None  # e.g. ".cache/embeddings.sqlite3" to persist
+    
+    # Semantic Answer Cache (size 0 disables; TTL in seconds, 0 = no expiry)
+    ANSWER_CACHE_THRESHOLD: float = 0.95
+    ANSWER_CACHE_SIZE: int = 512
+    ANSWER_CACHE_TTL: int = 3600
+    
+    # Direct FAQ Answers (catalog answer returned without an LLM call)
+    FAQ_DIRECT_ANSWERS: bool = True
+    FAQ_DIRECT_ANSWER_THRESHOLD: float = 0.95  # question-to-question cosine similarity, >= ANSWER_CACHE_THRESHOLD
+    
+    # FAQ Catalog (parsed once, reloaded when the file's content changes)
+    FAQ_RELOAD_CHECK_INTERVAL: float = 1.0  # seconds between mtime checks on lookup, 0 = every lookup
+    
+    # Startup Warm-up
+    WARMUP_ON_STARTUP: bool = True
+    WARMUP_PRECOMPUTE_ANSWERS: bool = True  # pin RAG answers for every catalog question
+    PRECOMPUTED_ANSWERS_PATH: str = str(Path(__file__).parent / ".cache" / "faq_answers.json")  # shared by workers
+    FAQ_WATCH_INTERVAL: float = 30.0  # seconds between FAQ source change checks, 0 disables
+    FAQ_AUTO_SYNC: bool = False  # re-ingest the FAQ index when the source changes
+    
+    # Logging (records are formatted and written on a background thread)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # "text" or "json" (one object per line)
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0  # fraction of DEBUG records kept
+    LOG_QUEUE_SIZE: int = 10000  # records beyond this are dropped instead of blocking requests
+    
+    # Production Server (gunicorn, see gunicorn.conf.py)
+    SERVER_WORKERS: int = 1  # 0 = one per CPU core; see gunicorn.conf.py before raising it
+    SERVER_WORKER_CLASS: str = "gthread"  # or "gevent" for many long-lived streams per worker
+    SERVER_THREADS: int = 8  # request threads per gthread worker
+    SERVER_WORKER_CONNECTIONS: int = 1000  # concurrent connections per gevent worker
+    SERVER_TIMEOUT: int = 120  # seconds a silent worker is given before it is restarted
+    SERVER_GRACEFUL_TIMEOUT: int = 30  # seconds in-flight requests get to finish on restart/stop
+    SERVER_KEEPALIVE: int = 5
+    SERVER_MAX_REQUESTS: int = 0  # recycle a worker after this many requests, 0 disables
+    
     # Application Configuration
     CHUNK_SIZE: int = 500
     CHUNK_OVERLAP: int = 100
+    
+    # Retrieval & Context Assembly
+    RETRIEVAL_FETCH_K: int = 8  # candidates over-fetched from the vector store
+    RETRIEVAL_TOP_K: int = 3  # documents kept in the prompt after MMR selection
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_MAX_CHUNK_TOKENS: int = 400
+    CONTEXT_MMR_LAMBDA: float = 0.7  # 1.0 = pure relevance, lower = more diversity
+    CONTEXT_DEDUP_THRESHOLD: float = 0.85  # word-overlap similarity treated as duplicate
+    
+    # Request Coalescing (concurrent identical questions share one pipeline run)
+    REQUEST_COALESCING: bool = True
+    
+    # Batch Question Answering (/ask/batch)
+    BATCH_MAX_QUESTIONS: int = 200
+    BATCH_MAX_CONCURRENCY: int = 8  # questions answered (LLM calls) in parallel per batch
+    
+    # Hybrid Retrieval (BM25 over FAQ question/tags/category + vector search)
+    HYBRID_RETRIEVAL: bool = True
+    LEXICAL_MIN_COVERAGE: float = 0.5  # share of query terms the top BM25 hit must match
+    LEXICAL_CONFIDENCE_MARGIN: float = 1.5  # top BM25 score vs runner-up to skip vector search
+    LEXICAL_MIN_SCORE: float = 5.0  # BM25 score the top hit needs to skip vector search (one keyword scores ~3)
+    RRF_K: int = 60
+    
+    # Category Routing (vector search pre-filtered to the nearest FAQ categories)
+    CATEGORY_ROUTING: bool = True
+    CATEGORY_ROUTING_MAX: int = 2  # most categories a query is routed to
+    CATEGORY_ROUTING_MARGIN: float = 0.05  # include categories within this similarity of the best
+    CATEGORY_ROUTING_MIN_SCORE: float = 0.5  # best centroid similarity needed to route
+    CATEGORY_ROUTED_TOP_K: int = 5  # candidates fetched when the search is routed
+    
+    # Ingestion Configuration (batched, concurrent, retrying upserts)
+    EMBED_BATCH_SIZE: int = 100
+    UPSERT_BATCH_SIZE: int = 100
+    INGEST_MAX_WORKERS: int = 4
+    INGEST_MAX_RETRIES: int = 3
+    INGEST_RETRY_BACKOFF: float = 1.0  # seconds, doubled on every retry
+    INGEST_MANIFEST_PATH: str = str(Path(__file__).parent / ".cache" / "ingest_manifest.json")
+    
+    # PDF Upload Pipeline
+    UPLOAD_DIR: str = str(Path(__file__).parent / "uploads")
+    PARSE_CACHE_DIR: str = str(Path(__file__).parent / ".cache" / "parse")
+    PARSE_MAX_WORKERS: int = 0  # 0 = one parser process per CPU core
+    INGEST_QUEUE_SIZE: int = 4  # parsed files buffered ahead of the embed/upsert stage
+
+    # Streaming Configuration (token coalescing instead of a fixed per-chunk delay)
+    STREAM_FLUSH_INTERVAL: float = 0.05  # seconds a partial buffer may wait before flushing
+    STREAM_FLUSH_BYTES: int = 64  # flush as soon as this many bytes are buffered
+    STREAM_HEARTBEAT_INTERVAL: float = 15.0  # SSE comment sent after this many idle seconds
+    RAG_STREAM_WORKERS: int = 16  # background retrieval threads for /ask/stream (Flask)
+
+    # Conversation Memory (streaming chat)
+    CONVERSATION_MAX_THREADS: int = 1000
+    CONVERSATION_IDLE_TTL: int = 3600  # seconds, 0 = never expire idle threads
+    CONVERSATION_TOKEN_BUDGET: int = 3000  # estimated history tokens kept per thread
+    CONVERSATION_SUMMARY: bool = True  # fold trimmed turns into a rolling summary
 
     # CORS Configuration (for FastAPI + Next.js local development)
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
@@ -5,30 +5,21 @@ Serves both UI and API endpoints in a single unified application.
 
 from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from logger import logger
+from logger import logger, new_request_id, request_id_var
 from config import settings
-from modules.llm import get_llm_agent
-from modules.query_handlers import query_agent
-from services.vectorstore_service import get_vectorstore_service
+from modules.rag_pipeline import get_rag_pipeline, validate_batch
+from modules.warmup import warm_up, is_ready
 from services.llm_service import get_llm_service
-from prompts import CLINICBOT_CHAT_PROMPT
-from langchain_core.documents import Document
-from langchain_core.retrievers import BaseRetriever
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from pydantic import Field
-from typing import List, Optional, Dict
-from threading import Lock
-import time
+from services.conversation_store import get_conversation_store
+from services.metrics import ERRORS, LLMStreamTimer, render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from modules.streaming import coalesce, sse_event, wants_sse, wants_ndjson, HEARTBEAT, SSE_HEARTBEAT
+from langchain_core.messages import HumanMessage
+import json
 import traceback
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 CORS(app)
 
-# Conversation memory for streaming chat
-conversation_memory: Dict[str, List] = {}
-memory_lock = Lock()
-STREAM_DELAY = 0.05  # 50ms delay between chunks
-
 
 @app.route('/')
 def index():
@@ -42,6 +33,38 @@ def health():
     return jsonify({"status": "healthy", "service": "MCP RAG Chatbot"}), 200
 
 
+@app.route('/ready')
+def ready():
+    """
+    Readiness check: 200 once the services are initialized, 503 while warm-up
+    is still running (liveness stays on /health).
+    """
+    if is_ready():
+        return jsonify({"status": "ready"}), 200
+    return jsonify({"status": "starting"}), 503
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics endpoint."""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.before_request
+def assign_request_id():
+    """Tag this request's log records with an ID (the client's X-Request-ID when sent)."""
+    new_request_id(request.headers.get('X-Request-ID'))
+
+
+@app.after_request
+def count_errors(response):
+    """Count failed requests for /metrics and echo the request ID."""
+    if response.status_code >= 500:
+        ERRORS.labels(endpoint=request.endpoint or "unknown").inc()
+    response.headers['X-Request-ID'] = request_id_var.get()
+    return response
+
+
 @app.route('/ask', methods=['POST'])
 def ask_question():
     """
@@ -58,27 +81,9 @@ def ask_question():
         if not question:
             return jsonify({"error": "Question is required"}), 400
         
-        logger.info(f"User query: {question}")
+        logger.info("User query: %s", question)
         
-        # Use VectorStore service for querying
-        vectorstore = get_vectorstore_service()
-        docs = vectorstore.query(question, top_k=3)
-        
-        # Create a simple retriever
-        class SimpleRetriever(BaseRetriever):
-            tags: Optional[List[str]] = Field(default_factory=list)
-            metadata: Optional[dict] = Field(default_factory=dict)
-            
-            def __init__(self, documents: List[Document]):
-                super().__init__()
-                self._docs = documents
-            
-            def _get_relevant_documents(self, query: str) -> List[Document]:
-                return self._docs
-        
-        retriever = SimpleRetriever(docs)
-        agent = get_llm_agent(retriever)
-        result = query_agent(agent, question)
+        result = get_rag_pipeline().answer(question)
         
         logger.info("Query successful")
         return jsonify(result), 200
@@ -92,10 +97,119 @@ def ask_question():
         }), 500
 
 
+@app.route('/ask/stream', methods=['POST'])
+def ask_stream():
+    """
+    Streaming RAG endpoint.
+    Sends the sources first, then answer tokens as the model produces them.
+    """
+    try:
+        payload = request.json if request.is_json else request.form
+        question = payload.get('question')
+        
+        if not question:
+            return jsonify({"error": "Question is required"}), 400
+        
+        # Start embedding + retrieval on a pool thread now; it runs while the
+        # format is checked and the LLM client is acquired
+        pipeline = get_rag_pipeline()
+        prepared = pipeline.start_stream(question)
+        get_llm_service().get_rag_llm()
+        
+        sse = wants_sse(payload.get('format'), request.headers.get('Accept'))
+        logger.info("Streaming query: %s", question)
+        events = pipeline.stream(prepared)
+        
+        def tokens():
+            for _, text in events:
+                yield text
+        
+        if sse:
+            def generate():
+                try:
+                    _, metadata = next(events)
+                    yield sse_event(json.dumps(metadata), event="sources")
+                    heartbeat = settings.STREAM_HEARTBEAT_INTERVAL
+                    for text in coalesce(tokens(), heartbeat_interval=heartbeat):
+                        yield SSE_HEARTBEAT if text is HEARTBEAT else sse_event(text)
+                    yield sse_event("", event="done")
+                except Exception as e:
+                    logger.exception("Error in ask_stream generator")
+                    ERRORS.labels(endpoint="ask_stream").inc()
+                    yield sse_event(f"Error: {str(e)}", event="error")
+            
+            return Response(
+                stream_with_context(generate()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+        
+        # Plain text: sources travel in a header, so the response starts only
+        # once retrieval is done (SSE starts it at once)
+        _, metadata = next(events)
+        
+        def generate_text():
+            try:
+                yield from coalesce(tokens())
+            except Exception as e:
+                logger.exception("Error in ask_stream generator")
+                ERRORS.labels(endpoint="ask_stream").inc()
+                yield f"Error: {str(e)}"
+        
+        return Response(
+            stream_with_context(generate_text()),
+            mimetype='text/plain',
+            headers={'X-Answer-Metadata': json.dumps(metadata)}
+        )
+        
+    except Exception as e:
+        logger.exception("Error in ask_stream endpoint")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/ask/batch', methods=['POST'])
+def ask_batch():
+    """
+    Batch question answering endpoint.
+    Embeds all questions in one call and answers them concurrently; results are
+    returned in request order, or streamed as NDJSON lines as each completes.
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        try:
+            questions = validate_batch(payload.get('questions'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        ndjson = wants_ndjson(payload.get('format'), request.headers.get('Accept'))
+        logger.info("Batch query: %d questions", len(questions))
+        pipeline = get_rag_pipeline()
+        
+        if ndjson:
+            def generate():
+                for index, result in pipeline.answer_batch(questions):
+                    yield json.dumps({"index": index, "question": questions[index], **result}) + "\n"
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        results = [None] * len(questions)
+        for index, result in pipeline.answer_batch(questions):
+            results[index] = {"question": questions[index], **result}
+        
+        logger.info("Batch query successful")
+        return jsonify({"results": results}), 200
+        
+    except Exception as e:
+        logger.exception("Error in ask_batch endpoint")
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/groq_stream', methods=['POST'])
 def groq_stream():
     """
-    Streaming chat endpoint using Server-Sent Events.
+    Streaming chat endpoint.
+    Streams coalesced plain-text chunks, or Server-Sent Events with heartbeats
+    when requested via format=sse or an Accept: text/event-stream header.
     Maintains conversation history per thread_id.
     """
     try:
@@ -103,14 +217,18 @@ def groq_stream():
         if request.is_json:
             question = request.json.get('question')
             thread_id = request.json.get('thread_id', 'default')
+            stream_format = request.json.get('format')
         else:
             question = request.form.get('question')
             thread_id = request.form.get('thread_id', 'default')
+            stream_format = request.form.get('format')
+        
+        sse = wants_sse(stream_format, request.headers.get('Accept'))
         
         if not question:
             return jsonify({"error": "Question is required"}), 400
         
-        logger.info(f"Groq stream request - thread_id: {thread_id}, question: {question}")
+        logger.info("Groq stream request - thread_id: %s, question: %s", thread_id, question)
         
         def generate():
             try:
@@ -118,38 +236,52 @@ def groq_stream():
                 llm_service = get_llm_service()
                 llm = llm_service.get_chat_llm()
                 
-                # Get conversation history for this thread_id
-                with memory_lock:
-                    if thread_id not in conversation_memory:
-                        # Initialize with system message
-                        conversation_memory[thread_id] = [
-                            SystemMessage(content=CLINICBOT_CHAT_PROMPT)
-                        ]
-                    
-                    messages = list(conversation_memory[thread_id])
+                # Get bounded conversation history for this thread_id
+                conversations = get_conversation_store()
+                messages = conversations.get_messages(thread_id)
                 
                 # Add the new user message
                 messages.append(HumanMessage(content=question))
                 
-                # Stream the response token by token
-                full_response = ""
-                for chunk in llm.stream(messages):
-                    if hasattr(chunk, "content") and chunk.content:
-                        content = chunk.content
-                        full_response += content
-                        yield content
-                        time.sleep(STREAM_DELAY)
+                # Stream the response, coalescing tokens into larger writes
+                parts = []
+                timer = LLMStreamTimer("groq_stream")
+                
+                def tokens():
+                    for chunk in llm.stream(messages):
+                        if hasattr(chunk, "content") and chunk.content:
+                            timer.mark_token()
+                            parts.append(chunk.content)
+                            yield chunk.content
+                
+                heartbeat = settings.STREAM_HEARTBEAT_INTERVAL if sse else None
+                for text in coalesce(tokens(), heartbeat_interval=heartbeat):
+                    if text is HEARTBEAT:
+                        yield SSE_HEARTBEAT
+                    else:
+                        yield sse_event(text) if sse else text
+                
+                full_response = "".join(parts)
+                timer.finish(messages, full_response)
                 
                 # Add both user message and AI response to memory
-                with memory_lock:
-                    conversation_memory[thread_id].append(HumanMessage(content=question))
-                    conversation_memory[thread_id].append(AIMessage(content=full_response))
+                conversations.append_turn(thread_id, question, full_response)
+                
+                if sse:
+                    yield sse_event("", event="done")
                 
             except Exception as e:
                 logger.exception("Error in groq_stream generator")
+                ERRORS.labels(endpoint="groq_stream").inc()
                 error_msg = f"Error: {str(e)}"
-                yield error_msg
+                yield sse_event(error_msg, event="error") if sse else error_msg
         
+        if sse:
+            return Response(
+                stream_with_context(generate()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
         return Response(stream_with_context(generate()), mimetype='text/plain')
         
     except Exception as e:
@@ -175,5 +307,8 @@ if __name__ == '__main__':
     # Use port 8080 in production (Docker), 3000 for local development
     port = int(os.environ.get('PORT', 3000))
     debug = os.environ.get('FLASK_ENV') != 'production'
+    # Warm up in the serving process only (not the debug reloader's watcher)
+    if settings.WARMUP_ON_STARTUP and (not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        warm_up()
     app.run(host='0.0.0.0', port=port, debug=debug)
 
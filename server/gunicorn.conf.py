@@ -0,0 +1,78 @@
+"""
+Gunicorn configuration for the production Flask app.
+
+    gunicorn -c gunicorn.conf.py
+
+The app and its heavy imports (langchain, pinecone, numpy) are loaded once in
+the master and shared copy-on-write by the workers; each worker then warms
+its own network clients in the background and reports readiness on /ready.
+gevent workers load the app after fork instead: the worker monkey-patches the
+stdlib on startup, and modules imported before that would keep unpatched
+threads and locks.
+
+Conversations, the answer and embedding caches and the local vector index are
+per-process state, and ingestion refreshes only the worker that ran it, so a
+single worker with SERVER_THREADS threads is the default (SERVER_WORKERS=1).
+
+Restart workers gracefully with ``kill -HUP <master pid>``: in-flight requests
+get SERVER_GRACEFUL_TIMEOUT seconds to finish. With preload_app new code is
+only picked up by a full restart (SIGTERM, which is equally graceful).
+"""
+
+import glob
+import multiprocessing
+import os
+import tempfile
+import threading
+
+from config import settings
+
+# Workers write their metric samples here so /metrics aggregates every worker.
+# Set before the app (and prometheus_client) is imported.
+if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="clinicbot-metrics-")
+
+wsgi_app = "flask_app:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+
+worker_class = settings.SERVER_WORKER_CLASS
+workers = settings.SERVER_WORKERS or multiprocessing.cpu_count()
+threads = settings.SERVER_THREADS
+worker_connections = settings.SERVER_WORKER_CONNECTIONS
+
+# A gevent worker patches the stdlib after fork, so the app has to load there too
+preload_app = worker_class != "gevent"
+
+timeout = settings.SERVER_TIMEOUT
+graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT
+keepalive = settings.SERVER_KEEPALIVE
+max_requests = settings.SERVER_MAX_REQUESTS
+max_requests_jitter = settings.SERVER_MAX_REQUESTS // 10
+
+errorlog = "-"
+
+
+def on_starting(server):
+    # Drop samples left by a previous run in a reused directory
+    for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(path)
+
+
+def when_ready(server):
+    # Master, before the first fork
+    if preload_app:
+        from modules.warmup import preload
+        preload()
+
+
+def post_worker_init(worker):
+    # Warm up in the background so the worker starts serving (and heartbeating) at once
+    if settings.WARMUP_ON_STARTUP:
+        from modules.warmup import warm_up
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+def child_exit(server, worker):
+    # Counters of a dead worker keep counting; its live gauges are dropped
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
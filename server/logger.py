@@ -1,17 +1,156 @@
-import logging 
+"""
+Logging configuration.
+Request threads only stamp and enqueue records; formatting and stream I/O
+happen on a background listener thread. Records are written as text or as one
+JSON object per line (LOG_FORMAT), tagged with the current request ID, and
+keyword ``extra`` fields (e.g. stage timings) are included in both formats.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from config import settings
+
+TEXT_FORMAT = "[%(asctime)s] [%(levelname)s] [%(request_id)s] --- [%(message)s]"
+
+# Set per request by the apps; "-" outside of a request (startup, background threads)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else on a record came from ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "request_id", "taskName"
+}
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """Set the request ID for the current context (the client's X-Request-ID when given)."""
+    request_id = (incoming or "").strip()[:64] or uuid.uuid4().hex
+    request_id_var.set(request_id)
+    return request_id
+
+
+def _extras(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRS}
+
+
+class TextFormatter(logging.Formatter):
+    """TEXT_FORMAT line followed by any ``extra`` fields as key=value pairs."""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        extras = _extras(record)
+        if extras:
+            line += " " + " ".join(f"{key}={value}" for key, value in extras.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+            **_extras(record),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Runs on the calling thread: stamps the request ID (context variables are
+    not visible from the listener thread) and keeps only a sample of DEBUG
+    records when ``debug_sample_rate`` < 1.
+    """
+
+    def __init__(self, debug_sample_rate: float = 1.0):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and random.random() >= self.debug_sample_rate:
+            return False
+        record.request_id = request_id_var.get()
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Enqueue records as-is so %-formatting happens on the listener thread, and
+    drop records instead of blocking when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+
+
+def _start_listener(handler: NonBlockingQueueHandler, output: logging.Handler):
+    global _listener
+    # Always a fresh queue: after a fork the parent's queue locks may be held
+    handler.queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def flush_logging():
+    """Block until every queued record has been written."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.queue.join()
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    if _listener is not None:
+        _listener.stop()
+
 
 def setup_logger(name="Assistant"):
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(settings.LOG_LEVEL.upper())
+
+    if logger.hasHandlers():
+        return logger
 
-    ch=logging.StreamHandler()
-    ch.setLevel(logging.DEBUG)
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter(TEXT_FORMAT))
 
-    formatter=logging.Formatter("[%(asctime)s] [%(levelname)s] --- [%(message)s]")
-    ch.setFormatter(formatter)
+    handler = NonBlockingQueueHandler(queue.Queue())
+    handler.addFilter(RequestContextFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+    _start_listener(handler, output)
+    logger.addHandler(handler)
 
-    if not logger.hasHandlers():
-        logger.addHandler(ch)
+    # The listener thread does not survive fork (e.g. gunicorn workers with preload).
+    # Flushing first keeps a parent's pending records from being lost or, under
+    # gevent where the listener is a greenlet that does survive, written twice.
+    os.register_at_fork(before=flush_logging, after_in_child=lambda: _start_listener(handler, output))
+    atexit.register(stop_logging)
     return logger
 
 logger = setup_logger()
@@ -1,14 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from middlewares.exception_handlers import catch_exceptions_middleware
+from middlewares.metrics import count_errors_middleware
+from middlewares.request_id import request_id_middleware
 from routes.ask_question import router as ask_router
 from routes.groq_stream import router as groq_stream_router
+from routes.metrics import router as metrics_router
 from config import settings
+from services.vectorstore_service import get_vectorstore_service
+from services.llm_service import get_llm_service
+from modules.warmup import warm_up
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialize clients/indexes before serving; answers are precomputed in the background
+    if settings.WARMUP_ON_STARTUP:
+        await asyncio.to_thread(warm_up)
+    yield
+    # Close the asyncio Pinecone session and pooled LLM connections
+    await get_vectorstore_service().aclose()
+    await get_llm_service().aclose()
+
 
 app=FastAPI(
     title="Clinic FAQ Chatbot API",
     description="AI-powered chatbot for aesthetic clinic patient questions",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS Setup with configured origins
@@ -24,10 +45,16 @@ app.add_middleware(
 
 # middleware exception handlers
 app.middleware("http")(catch_exceptions_middleware)
+# error counters for /metrics (registered last so it wraps the exception handler)
+app.middleware("http")(count_errors_middleware)
+# request IDs for log records (outermost, so every record in the request carries one)
+app.middleware("http")(request_id_middleware)
 
 # routers
 
 # 1. FAQ question answering (RAG-based)
 app.include_router(ask_router)
 # 2. Streaming chat (conversational)
-app.include_router(groq_stream_router)
\ No newline at end of file
+app.include_router(groq_stream_router)
+# 3. Prometheus metrics
+app.include_router(metrics_router)
\ No newline at end of file
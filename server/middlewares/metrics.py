@@ -0,0 +1,11 @@
+from fastapi import Request
+from services.metrics import ERRORS
+
+
+async def count_errors_middleware(request: Request, call_next):
+    """Count 5xx responses per route for /metrics."""
+    response = await call_next(request)
+    if response.status_code >= 500:
+        route = request.scope.get("route")
+        ERRORS.labels(endpoint=getattr(route, "name", None) or "unknown").inc()
+    return response
@@ -0,0 +1,10 @@
+from fastapi import Request
+from logger import new_request_id
+
+
+async def request_id_middleware(request: Request, call_next):
+    """Tag the request's log records with an ID (the client's X-Request-ID when sent) and echo it."""
+    request_id = new_request_id(request.headers.get("X-Request-ID"))
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
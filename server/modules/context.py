@@ -0,0 +1,133 @@
+"""
+Context assembly for the RAG prompt.
+Takes over-fetched retrieval candidates, removes chunk overlap and near-duplicates,
+selects a diverse subset with maximal marginal relevance (MMR) and packs it into a
+token budget.
+"""
+
+import re
+from typing import List, Optional, Set
+
+from langchain_core.documents import Document
+
+from config import settings
+from services.tokens import estimate_tokens
+
+_WORD_RE = re.compile(r"\w+")
+MIN_OVERLAP_CHARS = 20
+
+
+def _words(text: str) -> Set[str]:
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _strip_overlap(previous: str, text: str, max_overlap: int) -> str:
+    """Drop the prefix of ``text`` that repeats the tail of ``previous`` (splitter overlap)."""
+    limit = min(len(previous), len(text), max_overlap)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:].lstrip()
+    return text
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text to roughly ``max_tokens`` tokens at a word boundary."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, (max_tokens - 4) * 4)
+    cut = text[:max_chars]
+    space = cut.rfind(" ")
+    if space > max_chars // 2:
+        cut = cut[:space]
+    return cut.rstrip() + " ..."
+
+
+def assemble_context(
+    docs: List[Document],
+    top_k: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    max_chunk_tokens: Optional[int] = None,
+    mmr_lambda: Optional[float] = None,
+    dedup_threshold: Optional[float] = None,
+) -> List[Document]:
+    """
+    Select and trim retrieved documents for the prompt.
+
+    Args:
+        docs: Retrieval candidates, best first (``metadata['score']`` used when present)
+        top_k: Maximum number of documents to keep
+        token_budget: Maximum estimated tokens across all kept documents
+        max_chunk_tokens: Per-document truncation limit
+        mmr_lambda: Relevance/diversity trade-off (1.0 = pure relevance)
+        dedup_threshold: Word-set Jaccard similarity above which a candidate is a duplicate
+
+    Returns:
+        Documents to place in the prompt, in selection order
+    """
+    top_k = settings.RETRIEVAL_TOP_K if top_k is None else top_k
+    token_budget = settings.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    max_chunk_tokens = settings.CONTEXT_MAX_CHUNK_TOKENS if max_chunk_tokens is None else max_chunk_tokens
+    mmr_lambda = settings.CONTEXT_MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+    dedup_threshold = settings.CONTEXT_DEDUP_THRESHOLD if dedup_threshold is None else dedup_threshold
+
+    if not docs:
+        return []
+
+    # Relevance: similarity scores when every candidate has one (pure vector
+    # results), otherwise rank order (e.g. fused lexical + vector results)
+    n = len(docs)
+    if all("score" in doc.metadata for doc in docs):
+        relevance = [float(doc.metadata["score"]) for doc in docs]
+    else:
+        relevance = [1.0 - i / n for i in range(n)]
+    top = max(relevance)
+    if top > 0:
+        relevance = [r / top for r in relevance]
+    word_sets = [_words(doc.page_content) for doc in docs]
+
+    # Drop near-duplicates, keeping the more relevant copy
+    candidates: List[int] = []
+    for i in sorted(range(n), key=lambda i: relevance[i], reverse=True):
+        if all(_jaccard(word_sets[i], word_sets[j]) < dedup_threshold for j in candidates):
+            candidates.append(i)
+
+    # Maximal marginal relevance selection
+    selected: List[int] = []
+    while candidates and len(selected) < top_k:
+        best = max(
+            candidates,
+            key=lambda i: mmr_lambda * relevance[i] - (1 - mmr_lambda) * max(
+                (_jaccard(word_sets[i], word_sets[j]) for j in selected), default=0.0
+            ),
+        )
+        candidates.remove(best)
+        selected.append(best)
+
+    # Pack into the token budget, trimming splitter overlap and long chunks
+    packed: List[Document] = []
+    used = 0
+    kept_texts: List[str] = []
+    max_overlap = settings.CHUNK_OVERLAP * 2
+    for i in selected:
+        text = docs[i].page_content
+        for previous in kept_texts:
+            text = _strip_overlap(previous, text, max_overlap)
+        if not text:
+            continue
+
+        text = _truncate(text, min(max_chunk_tokens, token_budget - used))
+        tokens = estimate_tokens(text)
+        if used + tokens > token_budget or not text.strip(" ."):
+            break
+
+        used += tokens
+        kept_texts.append(docs[i].page_content)
+        packed.append(Document(page_content=text, metadata=docs[i].metadata))
+
+    return packed
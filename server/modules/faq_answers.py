@@ -0,0 +1,137 @@
+"""
+Direct FAQ answer fast path.
+Keeps a precomputed index of FAQ-question embeddings; when a user question is
+near-identical to a catalog question, the stored answer is returned without an LLM call.
+"""
+
+import asyncio
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import settings
+from logger import logger
+from modules.faq_loader import get_faq_catalog
+from services.vectorstore_service import get_vectorstore_service
+
+
+class FAQAnswerIndex:
+    """
+    Question-to-question similarity index over the FAQ catalog.
+
+    Args:
+        threshold: Minimum cosine similarity for a direct answer
+    """
+
+    def __init__(self, threshold: float = 0.95):
+        self.threshold = threshold
+        self._lock = Lock()
+        self._faqs: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._version: Optional[str] = None
+
+    def build(self):
+        """Embed every catalog question (one batched call for cache misses)."""
+        snapshot = get_faq_catalog().snapshot()
+        documents = snapshot.documents
+        questions = [doc.metadata["question"] for doc in documents]
+        embeddings = get_vectorstore_service().embed_queries(questions)
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+
+        faqs = [
+            {
+                "id": doc.metadata.get("id", ""),
+                "answer": faq["answer"],
+                "source": doc.metadata.get("source", "clinic_faq_knowledge_base"),
+            }
+            for faq, doc in zip(snapshot.faqs, documents)
+        ]
+
+        with self._lock:
+            self._faqs = faqs
+            self._matrix = matrix / norms
+            self._version = snapshot.version
+        logger.info(f"FAQ answer index built over {len(faqs)} questions")
+
+    @property
+    def ready(self) -> bool:
+        """Built against the current catalog version."""
+        return self._matrix is not None and self._version == get_faq_catalog().version
+
+    def invalidate(self):
+        """Force a rebuild on next use (e.g. after the FAQ catalog is re-ingested)."""
+        with self._lock:
+            self._matrix = None
+
+    def match(self, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """
+        Return a direct-answer result for a question embedding, or None.
+
+        The result is marked with ``direct_answer: True`` so clients can tell
+        it was served from the catalog rather than generated.
+        """
+        if not self.ready:
+            self.build()
+        with self._lock:
+            matrix, faqs = self._matrix, self._faqs
+        if matrix is None or not len(faqs):
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+
+        scores = matrix @ (query / norm)
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < self.threshold:
+            return None
+
+        faq = faqs[best]
+        logger.debug("Direct FAQ answer %s (similarity=%.4f)", faq['id'], score)
+        return {
+            "response": faq["answer"],
+            "sources": [faq["source"]],
+            "direct_answer": True,
+            "faq_id": faq["id"],
+            "match_score": round(score, 4),
+        }
+
+
+@lru_cache()
+def get_faq_answer_index() -> FAQAnswerIndex:
+    """Get singleton FAQ answer index, rebuilt lazily after re-ingestion."""
+    # A direct answer is served without retrieval or an LLM call, so it is
+    # never matched more loosely than a cached generated answer
+    threshold = max(settings.FAQ_DIRECT_ANSWER_THRESHOLD, settings.ANSWER_CACHE_THRESHOLD)
+    if threshold > settings.FAQ_DIRECT_ANSWER_THRESHOLD:
+        logger.warning(
+            f"FAQ_DIRECT_ANSWER_THRESHOLD {settings.FAQ_DIRECT_ANSWER_THRESHOLD} is below "
+            f"ANSWER_CACHE_THRESHOLD; using {threshold}"
+        )
+    index = FAQAnswerIndex(threshold=threshold)
+    get_vectorstore_service().add_ingest_listener(index.invalidate)
+    return index
+
+
+def direct_faq_answer(embedding: List[float]) -> Optional[Dict[str, Any]]:
+    """Catalog answer for a question embedding when the match is confident enough."""
+    if not settings.FAQ_DIRECT_ANSWERS:
+        return None
+    return get_faq_answer_index().match(embedding)
+
+
+async def adirect_faq_answer(embedding: List[float]) -> Optional[Dict[str, Any]]:
+    """Async variant of direct_faq_answer; a (re)build is run off the event loop."""
+    if not settings.FAQ_DIRECT_ANSWERS:
+        return None
+    index = get_faq_answer_index()
+    if not index.ready:
+        await asyncio.to_thread(index.build)
+    return index.match(embedding)
@@ -1,88 +1,208 @@
 """
 FAQ Loader Module
 Loads clinic FAQs from JSON and converts them into LangChain documents for vectorization.
+The parsed catalog is kept in memory and reloaded only when the file's content changes.
 """
 
+import hashlib
 import json
-import os
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Any
+from threading import Lock
+from typing import List, Dict, Any, NamedTuple, Optional
 from langchain_core.documents import Document
+from config import settings
 from logger import logger
 
+DEFAULT_FAQ_PATH = Path(__file__).parent.parent / "data" / "clinic_faqs.json"
 
-def load_faqs_from_json(json_path: str = None) -> List[Document]:
+# Vector ID prefix of the FAQ catalog in the index and the ingest manifest
+FAQ_ID_PREFIX = "faq"
+
+
+class _CatalogSnapshot(NamedTuple):
+    """Immutable parse of the FAQ file; swapped in as a whole on reload."""
+    version: str  # sha256 of the file content
+    mtime: float
+    faqs: List[Dict[str, Any]]
+    by_id: Dict[str, Dict[str, Any]]
+    by_category: Dict[str, List[Dict[str, Any]]]
+    documents: List[Document]
+
+
+def _faq_to_document(faq: Dict[str, Any]) -> Document:
+    # Create document content combining question and answer
+    content = f"Question: {faq['question']}\n\nAnswer: {faq['answer']}"
+
+    # Store metadata for tracking and filtering
+    metadata = {
+        'id': faq.get('id', ''),
+        'question': faq['question'],
+        'category': faq.get('category', 'General'),
+        'tags': ','.join(faq.get('tags', [])),
+        'source': 'clinic_faq_knowledge_base',
+        'text': content  # Store full text in metadata for retrieval
+    }
+
+    return Document(page_content=content, metadata=metadata)
+
+
+class FAQCatalog:
+    """
+    In-memory FAQ catalog with id and category indexes.
+
+    The file is parsed once; lookups stat it at most every ``check_interval``
+    seconds and re-parse only when its mtime changed *and* its content hash
+    differs, so touching or re-saving an unchanged file is free.
+
+    Args:
+        json_path: Path to the FAQ JSON file
+        check_interval: Minimum seconds between mtime checks (0 = every lookup)
+    """
+
+    def __init__(self, json_path: Path, check_interval: float = 1.0):
+        self.json_path = Path(json_path)
+        self.check_interval = check_interval
+        self._lock = Lock()
+        self._snapshot: Optional[_CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._rejected_mtime: Optional[float] = None
+
+    def _parse(self, raw: bytes, version: str, mtime: float) -> _CatalogSnapshot:
+        logger.info(f"Loading FAQs from: {self.json_path}")
+        data = json.loads(raw.decode('utf-8'))
+        faqs = data.get('faqs', []) if isinstance(data, dict) else None
+        if not isinstance(faqs, list) or not all(isinstance(faq, dict) for faq in faqs):
+            raise TypeError("FAQ file must be an object with a 'faqs' list of objects")
+
+        by_id: Dict[str, Dict[str, Any]] = {}
+        by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for faq in faqs:
+            if faq.get('id'):
+                by_id[faq['id']] = faq
+            if 'category' in faq:
+                by_category.setdefault(faq['category'], []).append(faq)
+
+        documents = [_faq_to_document(faq) for faq in faqs]
+        logger.info(f"Loaded {len(documents)} FAQs successfully")
+        return _CatalogSnapshot(version, mtime, faqs, by_id, by_category, documents)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload the catalog if the file changed.
+
+        Args:
+            force: Check the file now, ignoring ``check_interval``
+
+        Returns:
+            True if a new version of the catalog was loaded
+        """
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and not force and now - self._checked_at < self.check_interval:
+            return False
+
+        with self._lock:
+            snapshot = self._snapshot
+            self._checked_at = now
+            try:
+                mtime = self.json_path.stat().st_mtime
+            except FileNotFoundError:
+                if snapshot is None:
+                    raise FileNotFoundError(f"FAQ file not found at: {self.json_path}")
+                # Keep serving the last good catalog while the file is being replaced
+                logger.warning(f"FAQ file missing, keeping cached catalog: {self.json_path}")
+                return False
+
+            if snapshot is not None and mtime in (snapshot.mtime, self._rejected_mtime):
+                return False
+
+            raw = self.json_path.read_bytes()
+            version = hashlib.sha256(raw).hexdigest()
+            if snapshot is not None and version == snapshot.version:
+                self._snapshot = snapshot._replace(mtime=mtime)
+                return False
+
+            try:
+                self._snapshot = self._parse(raw, version, mtime)
+            except (ValueError, KeyError, TypeError):
+                if snapshot is None:
+                    raise
+                # A half-written or malformed file (e.g. an entry without an
+                # answer) must not take the catalog down
+                self._rejected_mtime = mtime
+                logger.exception(f"Invalid FAQ file, keeping cached catalog: {self.json_path}")
+                return False
+            return True
+
+    def snapshot(self) -> _CatalogSnapshot:
+        """Current catalog snapshot (reloaded first if the file changed)."""
+        self.refresh()
+        return self._snapshot
+
+    @property
+    def version(self) -> str:
+        return self.snapshot().version
+
+    @property
+    def documents(self) -> List[Document]:
+        return self.snapshot().documents
+
+    def get(self, faq_id: str) -> Optional[Dict[str, Any]]:
+        return self.snapshot().by_id.get(faq_id)
+
+    def categories(self) -> List[str]:
+        return sorted(self.snapshot().by_category)
+
+    def by_category(self, category: str) -> List[Dict[str, Any]]:
+        return list(self.snapshot().by_category.get(category, []))
+
+
+@lru_cache()
+def _catalog_for(json_path: str) -> FAQCatalog:
+    return FAQCatalog(Path(json_path), check_interval=settings.FAQ_RELOAD_CHECK_INTERVAL)
+
+
+def get_faq_catalog(json_path: str = None) -> FAQCatalog:
+    """Get the shared catalog for a FAQ file (defaults to the clinic knowledge base)."""
     if json_path is None:
-        # Default path relative to this module
-        json_path = Path(__file__).parent.parent / "data" / "clinic_faqs.json"
-    
-    json_path = Path(json_path)
-    
-    if not json_path.exists():
-        raise FileNotFoundError(f"FAQ file not found at: {json_path}")
-    
-    logger.info(f"Loading FAQs from: {json_path}")
-    
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    faqs = data.get('faqs', [])
-    
-    if not faqs:
+        json_path = DEFAULT_FAQ_PATH
+    return _catalog_for(str(Path(json_path).resolve()))
+
+
+def load_faqs_from_json(json_path: str = None) -> List[Document]:
+    documents = get_faq_catalog(json_path).documents
+
+    if not documents:
         raise ValueError("No FAQs found in the JSON file")
-    
-    documents = []
-    
-    for faq in faqs:
-        # Create document content combining question and answer
-        content = f"Question: {faq['question']}\n\nAnswer: {faq['answer']}"
-        
-        # Store metadata for tracking and filtering
-        metadata = {
-            'id': faq.get('id', ''),
-            'question': faq['question'],
-            'category': faq.get('category', 'General'),
-            'tags': ','.join(faq.get('tags', [])),
-            'source': 'clinic_faq_knowledge_base',
-            'text': content  # Store full text in metadata for retrieval
-        }
-        
-        doc = Document(
-            page_content=content,
-            metadata=metadata
-        )
-        
-        documents.append(doc)
-    
-    logger.info(f"Loaded {len(documents)} FAQs successfully")
-    
-    return documents
+
+    return list(documents)
+
+
+def sync_faq_index(json_path: str = None) -> int:
+    """
+    Sync the FAQ knowledge base into the vector store.
+
+    Uses content-hash IDs and the ingest manifest, so only FAQs whose text
+    changed are re-embedded and FAQs removed from the JSON are deleted.
+    """
+    from services.vectorstore_service import get_vectorstore_service
+
+    documents = load_faqs_from_json(json_path)
+    vectorstore = get_vectorstore_service()
+    vectorstore.ensure_index_exists()
+    return vectorstore.upsert_documents(documents, id_prefix=FAQ_ID_PREFIX, prune=True)
 
 
 def get_faq_categories(json_path: str = None) -> List[str]:
-    if json_path is None:
-        json_path = Path(__file__).parent.parent / "data" / "clinic_faqs.json"
-    
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    categories = set()
-    for faq in data.get('faqs', []):
-        if 'category' in faq:
-            categories.add(faq['category'])
-    
-    return sorted(list(categories))
+    return get_faq_catalog(json_path).categories()
 
 
 def get_faq_by_id(faq_id: str, json_path: str = None) -> Dict[str, Any]:
-    if json_path is None:
-        json_path = Path(__file__).parent.parent / "data" / "clinic_faqs.json"
-    
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    for faq in data.get('faqs', []):
-        if faq.get('id') == faq_id:
-            return faq
-    
-    return None
+    return get_faq_catalog(json_path).get(faq_id)
+
+
+if __name__ == "__main__":
+    count = sync_faq_index()
+    logger.info(f"FAQ sync complete: {count} vectors written")
@@ -0,0 +1,49 @@
+"""
+Pipeline instrumentation.
+Feeds the RAG pipeline's stage hooks into the Prometheus metrics served at
+/metrics, and logs one structured record per answer with its stage timings.
+Cache and coalescing counters are incremented where they happen.
+"""
+
+import logging
+from typing import Any, Dict
+
+from logger import logger
+from services.metrics import ANSWERS, STAGE_LATENCY, observe_llm
+
+
+def _observe_stage(stage: str, state: Dict[str, Any], elapsed: float):
+    STAGE_LATENCY.labels(stage=stage).observe(elapsed)
+
+
+def _observe_generation(stage: str, state: Dict[str, Any], elapsed: float):
+    observe_llm(
+        "ask",
+        elapsed,
+        state.get("prompt_tokens", 0),
+        state.get("completion_tokens", 0),
+        state.get("llm_time_to_first_token"),
+    )
+
+
+def _observe_answer(stage: str, state: Dict[str, Any], elapsed: float):
+    ANSWERS.labels(served_from=state["served_from"]).inc()
+
+
+def _log_answer(stage: str, state: Dict[str, Any], elapsed: float):
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    stage_ms = {name: round(seconds * 1000, 2) for name, seconds in state.get("timings", {}).items()}
+    logger.info(
+        "Answer served from %s in %.1f ms", state["served_from"], elapsed * 1000,
+        extra={"served_from": state["served_from"], "stage_ms": stage_ms},
+    )
+
+
+def instrument_pipeline(pipeline):
+    """Register the metric and logging hooks on a pipeline."""
+    for stage in pipeline.stages:
+        pipeline.add_hook(stage, _observe_stage)
+    pipeline.add_hook("generate", _observe_generation)
+    pipeline.add_hook("answer", _observe_answer)
+    pipeline.add_hook("answer", _log_answer)
@@ -0,0 +1,105 @@
+"""
+In-memory BM25 index over the FAQ catalog.
+Indexes each FAQ's question, tags and category so keyword-heavy queries
+("Botox price", "Sunday hours") can be answered without a vector search.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+from logger import logger
+from modules.faq_loader import get_faq_catalog
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i if in is it me my of on or
+our the to we what when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index.
+
+    Args:
+        documents: Documents to index
+        fields: Metadata fields whose text is indexed for each document
+        k1: Term-frequency saturation
+        b: Document-length normalisation
+    """
+
+    def __init__(
+        self,
+        documents: List[Document],
+        fields: Tuple[str, ...] = ("question", "tags", "category"),
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._lengths: List[int] = []
+
+        for i, doc in enumerate(documents):
+            text = " ".join(str(doc.metadata.get(field, "")).replace(",", " ") for field in fields)
+            terms = tokenize(text)
+            self._lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self._postings[term].append((i, tf))
+
+        n = len(documents)
+        self._avg_length = sum(self._lengths) / n if n else 0.0
+        self._idf = {
+            term: math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[Document, float, float]]:
+        """
+        Score documents against a query.
+
+        Returns:
+            (document, bm25 score, query-term coverage) tuples, best first
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        matched: Dict[int, int] = defaultdict(int)
+        for term in terms:
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self._postings[term]:
+                norm = 1 - self.b + self.b * self._lengths[i] / self._avg_length
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                matched[i] += 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.documents[i], score, matched[i] / len(terms)) for i, score in ranked]
+
+
+@lru_cache(maxsize=1)
+def _build_lexical_index(version: str) -> BM25Index:
+    documents = get_faq_catalog().documents
+    logger.info(f"Built BM25 index over {len(documents)} FAQs")
+    return BM25Index(documents)
+
+
+def get_lexical_index() -> BM25Index:
+    """Get the BM25 index over the FAQ catalog, rebuilt when the catalog reloads."""
+    return _build_lexical_index(get_faq_catalog().version)
@@ -1,59 +1,77 @@
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, HumanMessage
+from langchain_core.documents import Document
 from typing import List
-from services.llm_service import get_llm_service
 from prompts import CLINICBOT_RAG_PROMPT
 
 
-def get_llm_agent(retriever):
-    """Create a simple RAG chain with retriever."""
+def build_rag_prompt(user_question: str, retrieved_docs: List[Document]) -> List[BaseMessage]:
+    """Build the RAG chat messages for a question and its packed context."""
+    # Format context from retrieved documents
+    context = "\n\n".join([
+        f"FAQ Category: {doc.metadata.get('category', 'General')}\n{doc.page_content}"
+        for doc in retrieved_docs
+    ])
 
-    # Use LLM service
-    llm_service = get_llm_service()
-    llm = llm_service.get_rag_llm()
+    # Create the prompt with context
+    return [
+        SystemMessage(content=CLINICBOT_RAG_PROMPT),
+        HumanMessage(content=f"""Context from FAQ knowledge base:
 
-    # Return a simple object that has the retriever and LLM
-    class SimpleRAGAgent:
-        def __init__(self, llm, retriever):
-            self.llm = llm
-            self.retriever = retriever
+{context}
 
-        def invoke(self, inputs):
-            # Extract the user question
-            messages = inputs.get("messages", [])
-            if not messages:
-                return {"messages": []}
+User Question: {user_question}
 
-            user_message = messages[-1]
-            user_question = user_message.content if hasattr(user_message, 'content') else str(user_message)
+IMPORTANT: Answer the question using ONLY the information provided in the context above. Include ALL relevant details from the context - do not omit any important information. If the context mentions what days the clinic is closed, you MUST include that in your response.""")
+    ]
 
-            # Retrieve relevant documents
-            retrieved_docs = self.retriever.invoke(user_question)
 
-            # Format context from retrieved documents
-            context = "\n\n".join([
-                f"FAQ Category: {doc.metadata.get('category', 'General')}\n{doc.page_content}"
-                for doc in retrieved_docs
-            ])
+class SimpleRAGAgent:
+    """
+    Message-based agent interface (used by query_agent) over the shared RAGPipeline.
 
-            # Create the prompt with context
-            prompt_messages = [
-                SystemMessage(content=CLINICBOT_RAG_PROMPT),
-                HumanMessage(content=f"""Context from FAQ knowledge base:
+    ``invoke`` / ``ainvoke`` take ``{"messages": [...]}`` and answer the last
+    message; ``stream`` yields the pipeline's ``("sources", metadata)`` and
+    ``("token", text)`` events.
+    """
 
-{context}
+    def __init__(self, pipeline=None):
+        if pipeline is None:
+            # modules.rag_pipeline imports this module
+            from modules.rag_pipeline import get_rag_pipeline
+            pipeline = get_rag_pipeline()
+        self.pipeline = pipeline
 
-User Question: {user_question}
+    def invoke(self, inputs):
+        messages = inputs.get("messages", [])
+        if not messages:
+            return {"messages": []}
+        return self._result(messages, self.pipeline.answer(self._question(messages)))
 
-IMPORTANT: Answer the question using ONLY the information provided in the context above. Include ALL relevant details from the context - do not omit any important information. If the context mentions what days the clinic is closed, you MUST include that in your response.""")
-            ]
+    async def ainvoke(self, inputs):
+        messages = inputs.get("messages", [])
+        if not messages:
+            return {"messages": []}
+        return self._result(messages, await self.pipeline.aanswer(self._question(messages)))
+
+    def stream(self, inputs):
+        messages = inputs.get("messages", [])
+        if not messages:
+            return
+        yield from self.pipeline.stream(self.pipeline.start_stream(self._question(messages)))
+
+    @staticmethod
+    def _question(messages):
+        user_message = messages[-1]
+        return user_message.content if hasattr(user_message, 'content') else str(user_message)
 
-            # Get response from LLM
-            response = self.llm.invoke(prompt_messages)
+    @staticmethod
+    def _result(messages, result):
+        return {
+            "messages": messages + [AIMessage(content=result["response"])],
+            "sources": result["sources"]
+        }
 
-            # Return in the expected format with sources
-            return {
-                "messages": messages + [response],
-                "retrieved_docs": retrieved_docs
-            }
 
-    return SimpleRAGAgent(llm, retriever)
+def get_llm_agent(pipeline=None):
+    """Create a RAG agent over the shared pipeline."""
+    return SimpleRAGAgent(pipeline)
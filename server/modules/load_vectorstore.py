@@ -1,7 +1,14 @@
 import os
+import re
+import json
+import hashlib
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
 from pathlib import Path
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import List, Dict, Any, Tuple
+from langchain_core.documents import Document
 from config import settings
 from services.vectorstore_service import get_vectorstore_service
 from logger import logger
@@ -9,51 +16,196 @@ from logger import logger
 # Create upload directory
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
+COPY_CHUNK_SIZE = 1024 * 1024  # 1 MiB per read when saving uploads
+
+Chunk = Tuple[str, Dict[str, Any]]
+
+
 def load_vectorstore(uploaded_files):
     """
     Load PDF files into vector store.
 
+    Runs as a streaming pipeline: uploads are copied to disk in fixed-size
+    chunks, PDFs are parsed and split in a process pool (with a parse cache
+    keyed by file hash), and a bounded queue feeds each file's chunks to the
+    embed/upsert stage while the remaining files are still being parsed.
+
     Args:
         uploaded_files: List of uploaded files
 
     Returns:
         Number of chunks added to vectorstore
     """
-    file_paths = []
-
     # 1. Save uploaded files
-    for file in uploaded_files:
-        save_path = Path(settings.UPLOAD_DIR) / file.filename
-        with open(save_path, "wb") as f:
-            f.write(file.file.read())
-        file_paths.append(str(save_path))
-        logger.info(f"Saved file: {file.filename}")
-
-    # 2. Process and split PDFs
-    all_chunks = []
-    for path in file_paths:
-        logger.info(f"Processing {path}...")
-        loader = PyPDFLoader(path)
-        documents = loader.load()
-
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP
-        )
-        chunks = splitter.split_documents(documents)
-
-        # Add source to metadata
-        for chunk in chunks:
-            chunk.metadata["source"] = str(path)
-
-        all_chunks.extend(chunks)
-        logger.info(f"Split into {len(chunks)} chunks")
-
-    logger.info(f"Total chunks to embed: {len(all_chunks)}")
-
-    # 3. Use VectorStore service to embed and upsert
-    vectorstore = get_vectorstore_service()
-    count = vectorstore.upsert_documents(all_chunks, id_prefix="pdf")
-
-    logger.info(f"✅ Successfully uploaded {count} chunks to vectorstore")
-    return count
\ No newline at end of file
+    saved = [_save_upload(file) for file in uploaded_files]
+
+    # 2. Embed/upsert stage consumes parsed files from a bounded queue
+    chunk_queue: "queue.Queue" = queue.Queue(maxsize=max(1, settings.INGEST_QUEUE_SIZE))
+    consumer = _UpsertConsumer(chunk_queue)
+    consumer.start()
+
+    # 3. Parse and split PDFs in parallel, feeding the queue as files complete
+    try:
+        pending: List[Tuple[str, str]] = []
+        for path, file_hash in saved:
+            cached = _read_parse_cache(file_hash)
+            if cached is not None:
+                logger.info(f"Parse cache hit for {path}")
+                chunk_queue.put((path, _with_source(cached, path)))
+            else:
+                pending.append((path, file_hash))
+
+        if pending:
+            _parse_in_pool(pending, chunk_queue)
+    finally:
+        chunk_queue.put(None)
+        consumer.join()
+
+    if consumer.error is not None:
+        raise consumer.error
+
+    logger.info(f"✅ Successfully uploaded {consumer.count} chunks to vectorstore")
+    return consumer.count
+
+
+def _save_upload(file) -> Tuple[str, str]:
+    """Stream an upload to disk without holding it in memory; returns (path, sha256)."""
+    save_path = Path(settings.UPLOAD_DIR) / Path(file.filename).name
+    hasher = hashlib.sha256()
+    with open(save_path, "wb") as f:
+        while True:
+            block = file.file.read(COPY_CHUNK_SIZE)
+            if not block:
+                break
+            hasher.update(block)
+            f.write(block)
+    logger.info(f"Saved file: {file.filename}")
+    return str(save_path), hasher.hexdigest()
+
+
+def _parse_in_pool(pending: List[Tuple[str, str]], chunk_queue: "queue.Queue"):
+    """Parse files in a process pool, keeping at most max_workers files in flight."""
+    max_workers = settings.PARSE_MAX_WORKERS or os.cpu_count() or 1
+    max_workers = min(max_workers, len(pending))
+    remaining = iter(pending)
+    in_flight: Dict[Future, Tuple[str, str]] = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=_parse_context()) as pool:
+        def submit_next():
+            item = next(remaining, None)
+            if item is not None:
+                path, _ = item
+                logger.info(f"Processing {path}...")
+                future = pool.submit(
+                    _parse_and_split, path, settings.CHUNK_SIZE, settings.CHUNK_OVERLAP
+                )
+                in_flight[future] = item
+
+        for _ in range(max_workers):
+            submit_next()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, file_hash = in_flight.pop(future)
+                chunks = future.result()
+                logger.info(f"Split {path} into {len(chunks)} chunks")
+                _write_parse_cache(file_hash, chunks)
+                # Blocks when the upsert stage falls behind (backpressure)
+                chunk_queue.put((path, chunks))
+                submit_next()
+
+
+def _parse_context():
+    """
+    Start method for the parser processes.
+
+    Forking the server would copy its threads, held locks and open network
+    clients into the children, so they are started from a fork server (spawn
+    where unavailable) that has only this module imported.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _parse_and_split(path: str, chunk_size: int, chunk_overlap: int) -> List[Chunk]:
+    """Load and split one PDF. Runs in a worker process."""
+    # Heavy (langchain_community, pypdf): imported in the parsing worker only
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    documents = PyPDFLoader(path).load()
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    chunks = splitter.split_documents(documents)
+    return [(chunk.page_content, {**chunk.metadata, "source": path}) for chunk in chunks]
+
+
+class _UpsertConsumer(threading.Thread):
+    """Embed/upsert stage: drains (path, chunks) items until a None sentinel."""
+
+    def __init__(self, chunk_queue: "queue.Queue"):
+        super().__init__(name="pdf-upsert", daemon=True)
+        self.chunk_queue = chunk_queue
+        self.count = 0
+        self.error = None
+
+    def run(self):
+        vectorstore = get_vectorstore_service()
+        while True:
+            item = self.chunk_queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue  # keep draining so producers never block
+            path, chunks = item
+            try:
+                documents = [Document(page_content=text, metadata=meta) for text, meta in chunks]
+                # One manifest prefix per file so re-uploading a changed PDF
+                # only embeds new chunks and deletes the ones that vanished
+                self.count += vectorstore.upsert_documents(
+                    documents, id_prefix=_file_id_prefix(path), prune=True
+                )
+            except Exception as e:
+                logger.exception(f"Failed to upsert chunks for {path}")
+                self.error = e
+
+
+def _parse_cache_path(file_hash: str) -> Path:
+    key = f"{file_hash}-{settings.CHUNK_SIZE}-{settings.CHUNK_OVERLAP}"
+    return Path(settings.PARSE_CACHE_DIR) / f"{key}.json"
+
+
+def _read_parse_cache(file_hash: str):
+    path = _parse_cache_path(file_hash)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [tuple(item) for item in json.load(f)]
+    except (OSError, ValueError):
+        logger.warning(f"Ignoring unreadable parse cache entry {path}")
+        return None
+
+
+def _write_parse_cache(file_hash: str, chunks: List[Chunk]):
+    path = _parse_cache_path(file_hash)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(chunks, f)
+    os.replace(tmp_path, path)
+
+
+def _with_source(chunks: List[Chunk], path: str) -> List[Chunk]:
+    return [(text, {**meta, "source": path}) for text, meta in chunks]
+
+
+def _file_id_prefix(path: str) -> str:
+    """Stable, ASCII-safe vector ID prefix for an uploaded file."""
+    return "pdf-" + re.sub(r"[^A-Za-z0-9_.-]+", "_", Path(path).name)
@@ -1,46 +1,74 @@
 from logger import logger
 from langchain_core.messages import HumanMessage
-from typing import List, Dict, Any
+from typing import Dict, Any
+
 
 def query_agent(agent, user_input: str):
     """Query the agent and extract response with source documents."""
     try:
-        logger.debug(f"Running agent for input: {user_input}")
+        logger.debug("Running agent for input: %s", user_input)
 
         # Invoke the agent with a human message
         result = agent.invoke({
             "messages": [HumanMessage(content=user_input)]
         })
 
-        # Extract the final response from the agent
-        messages = result.get("messages", [])
-        final_message = messages[-1] if messages else None
+        response = format_result(result)
 
-        # Extract the response content
-        response_content = final_message.content if final_message else "No response generated"
+        logger.debug("Agent response: %s", response)
+        return response
+    except Exception:
+        logger.exception("Error on query agent")
+        raise
 
-        # Extract source documents from the result
-        source_documents = result.get("retrieved_docs", [])
 
-        # Extract source information from documents
-        sources = []
-        for doc in source_documents:
-            if hasattr(doc, 'metadata'):
-                source = doc.metadata.get("source") or doc.metadata.get("sources") or ""
-                if source and source not in sources:
-                    sources.append(source)
+async def aquery_agent(agent, user_input: str):
+    """Async variant of query_agent for agents exposing ainvoke."""
+    try:
+        logger.debug("Running agent (async) for input: %s", user_input)
 
-        # If no sources found, use a default
-        if not sources:
-            sources = ["clinic_faq_knowledge_base"]
+        result = await agent.ainvoke({
+            "messages": [HumanMessage(content=user_input)]
+        })
 
-        response = {
-            "response": response_content,
-            "sources": sources
-        }
+        response = format_result(result)
 
-        logger.debug(f"Agent response: {response}")
+        logger.debug("Agent response: %s", response)
         return response
-    except Exception as e:
+    except Exception:
         logger.exception("Error on query agent")
-        raise
\ No newline at end of file
+        raise
+
+
+def format_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the response text and source list from an agent result."""
+    # Extract the final response from the agent
+    messages = result.get("messages", [])
+    final_message = messages[-1] if messages else None
+
+    # Extract the response content
+    response_content = final_message.content if final_message else "No response generated"
+
+    # The pipeline agent reports its sources directly
+    if "sources" in result:
+        return {"response": response_content, "sources": result["sources"]}
+
+    # Extract source documents from the result
+    source_documents = result.get("retrieved_docs", [])
+
+    # Extract source information from documents
+    sources = []
+    for doc in source_documents:
+        if hasattr(doc, 'metadata'):
+            source = doc.metadata.get("source") or doc.metadata.get("sources") or ""
+            if source and source not in sources:
+                sources.append(source)
+
+    # If no sources found, use a default
+    if not sources:
+        sources = ["clinic_faq_knowledge_base"]
+
+    return {
+        "response": response_content,
+        "sources": sources
+    }
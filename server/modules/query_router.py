@@ -0,0 +1,156 @@
+"""
+Category query routing.
+Assigns a question embedding to the nearest FAQ categories (by cosine similarity
+to each category's centroid of question embeddings) so vector search can be
+pre-filtered to those categories.
+"""
+
+import asyncio
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from config import settings
+from logger import logger
+from modules.faq_loader import get_faq_catalog
+from services.vectorstore_service import get_vectorstore_service
+
+
+class Route(NamedTuple):
+    """Routed categories and the vector-store filter that restricts a search to them."""
+    categories: List[str]
+    filter: Dict[str, Any]
+    documents: int  # catalog documents in the routed categories
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class CategoryRouter:
+    """
+    Nearest-centroid router over the FAQ catalog categories.
+
+    Args:
+        max_categories: Most categories a query is routed to
+        margin: Categories scoring within this much of the best are included
+        min_score: Best centroid similarity required to route at all
+    """
+
+    def __init__(self, max_categories: int = 2, margin: float = 0.05, min_score: float = 0.5):
+        self.max_categories = max_categories
+        self.margin = margin
+        self.min_score = min_score
+        self._lock = Lock()
+        self._categories: List[str] = []
+        self._counts: Dict[str, int] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._version: Optional[str] = None
+
+    def build(self):
+        """Average the catalog's question embeddings per category (cache hits after the FAQ index)."""
+        snapshot = get_faq_catalog().snapshot()
+        documents = snapshot.documents
+        questions = [doc.metadata["question"] for doc in documents]
+        embeddings = _normalize(np.asarray(get_vectorstore_service().embed_queries(questions), dtype=np.float32))
+
+        members: Dict[str, List[int]] = {}
+        for row, doc in enumerate(documents):
+            members.setdefault(doc.metadata.get("category", "General"), []).append(row)
+        categories = sorted(members)
+        centroids = (
+            _normalize(np.stack([embeddings[members[c]].mean(axis=0) for c in categories]))
+            if categories else None
+        )
+
+        with self._lock:
+            self._categories = categories
+            self._counts = {category: len(members[category]) for category in categories}
+            self._centroids = centroids
+            self._version = snapshot.version
+        logger.info(f"Category router built over {len(categories)} categories")
+
+    @property
+    def ready(self) -> bool:
+        """Built against the current catalog version."""
+        return self._centroids is not None and self._version == get_faq_catalog().version
+
+    def invalidate(self):
+        """Force a rebuild on next use (e.g. after the FAQ catalog is re-ingested)."""
+        with self._lock:
+            self._centroids = None
+
+    def route(self, embedding: List[float]) -> Optional[List[str]]:
+        """Categories for a question embedding, best first, or None when no confident subset exists."""
+        if not self.ready:
+            self.build()
+        with self._lock:
+            centroids, categories = self._centroids, self._categories
+        if centroids is None or len(categories) < 2:
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+
+        scores = centroids @ (query / norm)
+        order = np.argsort(-scores)
+        best = float(scores[order[0]])
+        if best < self.min_score:
+            return None
+
+        routed = [categories[i] for i in order[:self.max_categories] if scores[i] >= best - self.margin]
+        # Routing to every category filters nothing
+        if len(routed) == len(categories):
+            return None
+        logger.debug("Routed query to %s (similarity=%.4f)", routed, best)
+        return routed
+
+    def plan(self, embedding: List[float]) -> Optional[Route]:
+        """
+        Route a question embedding and build its filter, or None to search everything.
+
+        The filter excludes the other FAQ categories rather than requiring a
+        routed one, so chunks without a category (uploaded PDFs) stay searchable.
+        """
+        routed = self.route(embedding)
+        if not routed:
+            return None
+        with self._lock:
+            excluded = [c for c in self._categories if c not in routed]
+            documents = sum(self._counts.get(c, 0) for c in routed)
+        return Route(routed, {"category": {"$nin": excluded}}, documents)
+
+
+@lru_cache()
+def get_category_router() -> CategoryRouter:
+    """Get singleton category router, rebuilt lazily after re-ingestion."""
+    router = CategoryRouter(
+        max_categories=settings.CATEGORY_ROUTING_MAX,
+        margin=settings.CATEGORY_ROUTING_MARGIN,
+        min_score=settings.CATEGORY_ROUTING_MIN_SCORE,
+    )
+    get_vectorstore_service().add_ingest_listener(router.invalidate)
+    return router
+
+
+def route_query(embedding: List[float]) -> Optional[Route]:
+    """Route for a question embedding, or None when routing is off or not confident."""
+    if not settings.CATEGORY_ROUTING:
+        return None
+    return get_category_router().plan(embedding)
+
+
+async def aroute_query(embedding: List[float]) -> Optional[Route]:
+    """Async variant of route_query; a (re)build is run off the event loop."""
+    if not settings.CATEGORY_ROUTING:
+        return None
+    router = get_category_router()
+    if not router.ready:
+        await asyncio.to_thread(router.build)
+    return router.plan(embedding)
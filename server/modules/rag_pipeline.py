@@ -0,0 +1,502 @@
+"""
+RAG pipeline.
+A single long-lived object, built once at startup and shared by the Flask and
+FastAPI apps, that answers a question in explicit stages:
+embed -> (answer cache / direct FAQ answer) -> retrieve -> assemble -> generate.
+"""
+
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from config import settings
+from logger import logger
+from modules.context import assemble_context
+from modules.faq_answers import direct_faq_answer, adirect_faq_answer
+from modules.instrumentation import instrument_pipeline
+from modules.llm import build_rag_prompt
+from modules.query_handlers import format_result
+from modules.retrieval import hybrid_query, ahybrid_query
+from services.answer_cache import get_answer_cache
+from services.tokens import estimate_tokens
+from services.embedding_cache import normalize_query
+from services.llm_service import get_llm_service
+from services.metrics import COALESCED, ERRORS
+from services.singleflight import SingleFlight, AsyncSingleFlight
+from services.vectorstore_service import get_vectorstore_service
+
+# "answer" fires once per request, after the answer is produced by any path
+STAGES = ("embed", "retrieve", "assemble", "generate", "answer")
+
+# hook(stage, state, elapsed_seconds)
+StageHook = Callable[[str, Dict[str, Any], float], None]
+
+
+class RAGPipeline:
+    """
+    Question answering pipeline with per-stage hooks.
+
+    Each request carries a ``state`` dict through the stages: ``question``,
+    ``embedding``, ``served_from`` ("cache", "faq" or "rag"), ``candidates``
+    (retrieved documents), ``documents`` (packed context), ``result``,
+    ``prompt_tokens`` / ``completion_tokens`` after generation and, for
+    streamed answers, ``time_to_first_token`` (from the request start) and
+    ``llm_time_to_first_token`` (from the LLM call). ``timings`` maps each
+    completed stage to its elapsed seconds.
+    Hooks see the state after their stage completes.
+
+    Args:
+        fetch_k: Candidates over-fetched by the retrieve stage
+    """
+
+    stages = STAGES
+
+    def __init__(self, fetch_k: Optional[int] = None):
+        self.fetch_k = settings.RETRIEVAL_FETCH_K if fetch_k is None else fetch_k
+        self.vectorstore = get_vectorstore_service()
+        self.answer_cache = get_answer_cache()
+        self.llm_service = get_llm_service()
+        self._hooks: Dict[str, List[StageHook]] = {stage: [] for stage in STAGES}
+        self._flights = SingleFlight(on_shared=COALESCED.labels(mode="sync").inc)
+        self._aflights = AsyncSingleFlight(on_shared=COALESCED.labels(mode="async").inc)
+        self._prepare_pool: Optional[ThreadPoolExecutor] = None
+
+    def add_hook(self, stage: str, hook: StageHook):
+        """Call ``hook(stage, state, elapsed)`` after every run of ``stage``."""
+        if stage not in self._hooks:
+            raise ValueError(f"Unknown pipeline stage: {stage}")
+        self._hooks[stage].append(hook)
+
+    def _emit(self, stage: str, state: Dict[str, Any], started: float):
+        self._notify(stage, state, time.perf_counter() - started)
+
+    def _notify(self, stage: str, state: Dict[str, Any], elapsed: float):
+        state.setdefault("timings", {})[stage] = elapsed
+        for hook in self._hooks[stage]:
+            try:
+                hook(stage, state, elapsed)
+            except Exception:
+                logger.exception("Pipeline hook failed for stage: %s", stage)
+
+    # Stages
+
+    def embed(self, state: Dict[str, Any]):
+        state["embedding"] = self.vectorstore.embed_query(state["question"])
+
+    async def aembed(self, state: Dict[str, Any]):
+        state["embedding"] = await self.vectorstore.aembed_query(state["question"])
+
+    def retrieve(self, state: Dict[str, Any]):
+        # Over-fetch; the assemble stage dedups and packs the context. The
+        # embed stage's vector is reused so a question is embedded once.
+        state["candidates"] = hybrid_query(
+            state["question"], top_k=self.fetch_k, embedding=state["embedding"]
+        )
+
+    async def aretrieve(self, state: Dict[str, Any]):
+        state["candidates"] = await ahybrid_query(
+            state["question"], top_k=self.fetch_k, embedding=state["embedding"]
+        )
+
+    def assemble(self, state: Dict[str, Any]):
+        state["documents"] = assemble_context(state["candidates"])
+
+    def generate(self, state: Dict[str, Any]):
+        prompt = build_rag_prompt(state["question"], state["documents"])
+        response = self.llm_service.get_rag_llm().invoke(prompt)
+        state["result"] = format_result({"messages": [response], "retrieved_docs": state["documents"]})
+        self._record_usage(state, prompt, getattr(response, "usage_metadata", None))
+
+    async def agenerate(self, state: Dict[str, Any]):
+        prompt = build_rag_prompt(state["question"], state["documents"])
+        response = await self.llm_service.get_rag_llm().ainvoke(prompt)
+        state["result"] = format_result({"messages": [response], "retrieved_docs": state["documents"]})
+        self._record_usage(state, prompt, getattr(response, "usage_metadata", None))
+
+    @staticmethod
+    def _record_usage(state: Dict[str, Any], prompt: List[BaseMessage], usage: Optional[Dict[str, int]]):
+        # Provider-reported token usage when available, otherwise the budget estimate
+        if usage:
+            state["prompt_tokens"] = usage.get("input_tokens", 0)
+            state["completion_tokens"] = usage.get("output_tokens", 0)
+        else:
+            state["prompt_tokens"] = sum(estimate_tokens(str(message.content)) for message in prompt)
+            state["completion_tokens"] = estimate_tokens(state["result"]["response"])
+
+    # Runners
+
+    def _run_stage(self, stage: str, func: Callable[[Dict[str, Any]], None], state: Dict[str, Any]):
+        started = time.perf_counter()
+        func(state)
+        self._emit(stage, state, started)
+
+    async def _arun_stage(self, stage: str, func, state: Dict[str, Any]):
+        started = time.perf_counter()
+        await func(state)
+        self._emit(stage, state, started)
+
+    def _cached_answer(self, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Serve paraphrases of already answered questions from the answer cache
+        cached = self.answer_cache.lookup(state["embedding"])
+        if cached is not None:
+            logger.info("Answer cache hit")
+            state["served_from"] = "cache"
+        return cached
+
+    def _direct_answer(self, state: Dict[str, Any], direct: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        # Near-identical to a catalog question: answer straight from the FAQ
+        if direct is not None:
+            logger.info("Direct FAQ answer: %s", direct['faq_id'])
+            state["served_from"] = "faq"
+        return direct
+
+    def answer(
+        self,
+        question: str,
+        use_cache: bool = True,
+        embedding: Optional[List[float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Answer a question.
+
+        Concurrent calls for the same normalized question share one computation
+        (REQUEST_COALESCING); every caller gets its own copy of the result.
+
+        Args:
+            question: User question
+            use_cache: Consult (and fill) the answer cache and direct FAQ answers;
+                False always runs retrieval and generation
+            embedding: Precomputed question embedding (skips the embed stage)
+
+        Returns:
+            Response dict with ``response`` and ``sources`` (plus ``cached`` or
+            ``direct_answer`` markers when served without the LLM)
+        """
+        if not settings.REQUEST_COALESCING:
+            return self._answer(question, use_cache, embedding)
+        key = (normalize_query(question), use_cache)
+        return dict(self._flights.do(key, self._answer, question, use_cache, embedding))
+
+    async def aanswer(
+        self,
+        question: str,
+        use_cache: bool = True,
+        embedding: Optional[List[float]] = None
+    ) -> Dict[str, Any]:
+        """Async variant of answer; never blocks the event loop on I/O."""
+        if not settings.REQUEST_COALESCING:
+            return await self._aanswer(question, use_cache, embedding)
+        key = (normalize_query(question), use_cache)
+        return dict(await self._aflights.do(key, self._aanswer, question, use_cache, embedding))
+
+    def coalescing_stats(self) -> Dict[str, Dict[str, int]]:
+        """In-flight, executed and shared (coalesced) call counts."""
+        return {"sync": self._flights.stats(), "async": self._aflights.stats()}
+
+    def _prepare(
+        self,
+        question: str,
+        use_cache: bool = True,
+        embedding: Optional[List[float]] = None
+    ) -> Dict[str, Any]:
+        """Run everything up to generation; ``state['result']`` is set when short-circuited."""
+        state: Dict[str, Any] = {"question": question, "served_from": "rag", "started_at": time.perf_counter()}
+
+        if embedding is None:
+            self._run_stage("embed", self.embed, state)
+        else:
+            state["embedding"] = embedding
+        if use_cache:
+            result = self._cached_answer(state)
+            if result is None:
+                result = self._direct_answer(state, direct_faq_answer(state["embedding"]))
+            if result is not None:
+                state["result"] = result
+                return state
+
+        self._run_stage("retrieve", self.retrieve, state)
+        self._run_stage("assemble", self.assemble, state)
+        return state
+
+    async def _aprepare(
+        self,
+        question: str,
+        use_cache: bool = True,
+        embedding: Optional[List[float]] = None
+    ) -> Dict[str, Any]:
+        state: Dict[str, Any] = {"question": question, "served_from": "rag", "started_at": time.perf_counter()}
+
+        if embedding is None:
+            await self._arun_stage("embed", self.aembed, state)
+        else:
+            state["embedding"] = embedding
+        if use_cache:
+            result = self._cached_answer(state)
+            if result is None:
+                result = self._direct_answer(state, await adirect_faq_answer(state["embedding"]))
+            if result is not None:
+                state["result"] = result
+                return state
+
+        await self._arun_stage("retrieve", self.aretrieve, state)
+        self._run_stage("assemble", self.assemble, state)
+        return state
+
+    def _answer(
+        self,
+        question: str,
+        use_cache: bool,
+        embedding: Optional[List[float]]
+    ) -> Dict[str, Any]:
+        state = self._prepare(question, use_cache, embedding)
+        if "result" not in state:
+            self._run_stage("generate", self.generate, state)
+            if use_cache:
+                self.answer_cache.store(question, state["embedding"], state["result"])
+
+        self._emit("answer", state, state["started_at"])
+        return state["result"]
+
+    async def _aanswer(
+        self,
+        question: str,
+        use_cache: bool,
+        embedding: Optional[List[float]]
+    ) -> Dict[str, Any]:
+        state = await self._aprepare(question, use_cache, embedding)
+        if "result" not in state:
+            await self._arun_stage("generate", self.agenerate, state)
+            if use_cache:
+                self.answer_cache.store(question, state["embedding"], state["result"])
+
+        self._emit("answer", state, state["started_at"])
+        return state["result"]
+
+    # Streaming
+
+    @property
+    def _stream_pool(self) -> ThreadPoolExecutor:
+        if self._prepare_pool is None:
+            self._prepare_pool = ThreadPoolExecutor(
+                max_workers=settings.RAG_STREAM_WORKERS,
+                thread_name_prefix="ask-stream"
+            )
+        return self._prepare_pool
+
+    def start_stream(self, question: str) -> Future:
+        """
+        Start embedding and retrieval for a streamed answer in the background.
+
+        Call this as soon as the question is known; the caller can finish
+        validating the request and set up its response while retrieval runs,
+        then pass the returned future to ``stream``.
+        """
+        # Copy the caller's context so log records keep its request ID
+        return self._stream_pool.submit(contextvars.copy_context().run, self._prepare, question)
+
+    async def astart_stream(self, question: str) -> "asyncio.Task":
+        """
+        Async variant of start_stream (runs as a task on the current loop).
+
+        Returns once the task has run up to its first await, so the embedding
+        request is already in flight when the caller continues.
+        """
+        task = asyncio.ensure_future(self._aprepare(question))
+        try:
+            await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        return task
+
+    @staticmethod
+    def _stream_metadata(state: Dict[str, Any]) -> Dict[str, Any]:
+        # Sources (and cache/direct-answer markers) sent before the first token
+        result = state.get("result")
+        if result is not None:
+            return {key: value for key, value in result.items() if key != "response"}
+        return {"sources": format_result({"retrieved_docs": state["documents"]})["sources"]}
+
+    def _finish_stream(
+        self,
+        state: Dict[str, Any],
+        metadata: Dict[str, Any],
+        prompt: List[BaseMessage],
+        parts: List[str],
+        usage: Optional[Dict[str, int]],
+        started: float
+    ):
+        state["result"] = {"response": "".join(parts), "sources": metadata["sources"]}
+        self._record_usage(state, prompt, usage)
+        self._emit("generate", state, started)
+        self.answer_cache.store(state["question"], state["embedding"], state["result"])
+
+    def stream(self, prepared: Future) -> Iterator[Tuple[str, Any]]:
+        """
+        Stream an answer as ``(event, data)`` pairs.
+
+        Yields ``("sources", metadata)`` first, then ``("token", text)`` as the
+        LLM produces them (cached and direct answers arrive as a single token).
+        """
+        state = prepared.result()
+        metadata = self._stream_metadata(state)
+        yield "sources", metadata
+
+        if "result" in state:
+            yield "token", state["result"]["response"]
+        else:
+            started = time.perf_counter()
+            prompt = build_rag_prompt(state["question"], state["documents"])
+            parts: List[str] = []
+            usage = None
+            for chunk in self.llm_service.get_rag_llm().stream(prompt):
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if chunk.content:
+                    if not parts:
+                        now = time.perf_counter()
+                        state["time_to_first_token"] = now - state["started_at"]
+                        state["llm_time_to_first_token"] = now - started
+                    parts.append(chunk.content)
+                    yield "token", chunk.content
+            self._finish_stream(state, metadata, prompt, parts, usage, started)
+
+        self._emit("answer", state, state["started_at"])
+
+    async def astream(self, prepared: Awaitable[Dict[str, Any]]) -> AsyncIterator[Tuple[str, Any]]:
+        """Async variant of stream."""
+        state = await prepared
+        metadata = self._stream_metadata(state)
+        yield "sources", metadata
+
+        if "result" in state:
+            yield "token", state["result"]["response"]
+        else:
+            started = time.perf_counter()
+            prompt = build_rag_prompt(state["question"], state["documents"])
+            parts: List[str] = []
+            usage = None
+            async for chunk in self.llm_service.get_rag_llm().astream(prompt):
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if chunk.content:
+                    if not parts:
+                        now = time.perf_counter()
+                        state["time_to_first_token"] = now - state["started_at"]
+                        state["llm_time_to_first_token"] = now - started
+                    parts.append(chunk.content)
+                    yield "token", chunk.content
+            self._finish_stream(state, metadata, prompt, parts, usage, started)
+
+        self._emit("answer", state, state["started_at"])
+
+    # Batches
+
+    def _embed_batch(self, questions: List[str]) -> List[List[float]]:
+        # One embed_documents call for every question missing from the embedding
+        # cache. Each question's embed stage gets an equal share of the call, so
+        # the stage histogram stays per question; the call itself is recorded
+        # under the embed_documents embedding request metric.
+        started = time.perf_counter()
+        embeddings = self.vectorstore.embed_queries(questions)
+        share = (time.perf_counter() - started) / len(questions)
+        for question, embedding in zip(questions, embeddings):
+            self._notify("embed", {"question": question, "embedding": embedding}, share)
+        return embeddings
+
+    @staticmethod
+    def _batch_error(index: int, error: Exception) -> Dict[str, Any]:
+        logger.error("Batch question %d failed: %s", index, error)
+        ERRORS.labels(endpoint="ask_batch").inc()
+        return {"error": str(error), "response": None, "sources": []}
+
+    def answer_batch(
+        self,
+        questions: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Answer several questions, yielding ``(index, result)`` as each completes.
+
+        Questions are embedded in one batched call and each vector is carried
+        through the answer cache, direct FAQ match and retrieval, so no question
+        is embedded again. They are then answered on at most
+        ``max_concurrency`` threads, which bounds the concurrent retrieval and
+        LLM calls. A failing question yields an ``error`` result instead of
+        aborting the batch.
+        """
+        if not questions:
+            return
+        max_concurrency = max_concurrency or settings.BATCH_MAX_CONCURRENCY
+        embeddings = self._embed_batch(questions)
+
+        pool = ThreadPoolExecutor(
+            max_workers=max(1, min(max_concurrency, len(questions))),
+            thread_name_prefix="ask-batch"
+        )
+        try:
+            futures = {
+                pool.submit(contextvars.copy_context().run, self.answer, question, embedding=embedding): index
+                for index, (question, embedding) in enumerate(zip(questions, embeddings))
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    yield index, future.result()
+                except Exception as e:
+                    yield index, self._batch_error(index, e)
+        finally:
+            # Stop queued work if the consumer goes away (e.g. client disconnect)
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def aanswer_batch(
+        self,
+        questions: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """Async variant of answer_batch; concurrency is bounded by a semaphore."""
+        if not questions:
+            return
+        max_concurrency = max_concurrency or settings.BATCH_MAX_CONCURRENCY
+        embeddings = await asyncio.to_thread(self._embed_batch, questions)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run(index: int, question: str, embedding: List[float]):
+            async with semaphore:
+                try:
+                    return index, await self.aanswer(question, embedding=embedding)
+                except Exception as e:
+                    return index, self._batch_error(index, e)
+
+        tasks = [
+            asyncio.ensure_future(run(index, question, embedding))
+            for index, (question, embedding) in enumerate(zip(questions, embeddings))
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def validate_batch(questions: Any) -> List[str]:
+    """Check a batch request body's question list, raising ValueError when invalid."""
+    if not isinstance(questions, list) or not questions:
+        raise ValueError("questions must be a non-empty list")
+    if len(questions) > settings.BATCH_MAX_QUESTIONS:
+        raise ValueError(f"At most {settings.BATCH_MAX_QUESTIONS} questions per batch")
+    if not all(isinstance(q, str) and q.strip() for q in questions):
+        raise ValueError("Every question must be a non-empty string")
+    return questions
+
+
+@lru_cache()
+def get_rag_pipeline() -> RAGPipeline:
+    """Get singleton RAG pipeline (instrumented for /metrics)."""
+    pipeline = RAGPipeline()
+    instrument_pipeline(pipeline)
+    return pipeline
@@ -0,0 +1,151 @@
+"""
+Hybrid lexical + vector retrieval.
+Confident BM25 hits over the FAQ catalog skip the vector search when the index
+holds nothing but the catalog; otherwise the lexical and vector rankings are
+merged with reciprocal rank fusion (RRF).
+Vector search is pre-filtered to the query's routed FAQ categories when routing
+is confident, falling back to an unfiltered search when the filtered search
+returns fewer matches than the routed categories hold.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from config import settings
+from logger import logger
+from modules.faq_loader import FAQ_ID_PREFIX
+from modules.lexical_index import get_lexical_index
+from modules.query_router import Route, aroute_query, route_query
+from services.vectorstore_service import get_vectorstore_service
+
+
+def _doc_key(doc: Document) -> str:
+    return doc.metadata.get("id") or doc.page_content
+
+
+def lexical_search(question: str, top_k: int) -> Tuple[List[Document], bool]:
+    """
+    BM25 search over the FAQ catalog.
+
+    Returns:
+        (documents best first, whether the top hit is confident enough to skip vector search)
+    """
+    hits = get_lexical_index().search(question, top_k=top_k)
+    if not hits:
+        return [], False
+
+    _, top_score, coverage = hits[0]
+    runner_up = hits[1][1] if len(hits) > 1 else 0.0
+    # The absolute floor keeps a lone one-keyword hit (no runner-up) from counting as confident
+    confident = (
+        coverage >= settings.LEXICAL_MIN_COVERAGE
+        and top_score >= settings.LEXICAL_MIN_SCORE
+        and top_score >= settings.LEXICAL_CONFIDENCE_MARGIN * runner_up
+    )
+    return [doc for doc, _, _ in hits], confident
+
+
+def _lexical_only(confident: bool) -> bool:
+    # BM25 only covers the FAQ catalog; other ingested documents (uploaded PDFs)
+    # are only reachable through the vector search
+    if not confident or get_vectorstore_service().has_documents_outside(FAQ_ID_PREFIX):
+        return False
+    logger.debug("Confident lexical match, skipping vector search")
+    return True
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: Optional[int] = None) -> List[Document]:
+    """Merge ranked lists; a document's score is the sum of 1 / (k + rank) over lists."""
+    k = settings.RRF_K if k is None else k
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            # Prefer the vector copy, which carries the similarity score
+            if key not in docs or "score" in doc.metadata:
+                docs[key] = doc
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+def _routed_top_k(top_k: int) -> int:
+    return min(top_k, settings.CATEGORY_ROUTED_TOP_K)
+
+
+def _routed_enough(route: Route, docs: List[Document], top_k: int) -> bool:
+    # A routed category may hold a single FAQ, so compare against what the
+    # categories contain rather than a fixed count; fewer means the index is
+    # missing routed documents (e.g. not yet re-ingested)
+    expected = min(top_k, route.documents)
+    if len(docs) >= expected:
+        return True
+    logger.debug("Routed search returned %d of %d expected matches, searching all categories", len(docs), expected)
+    return False
+
+
+def vector_search(question: str, top_k: int, embedding: Optional[List[float]] = None) -> List[Document]:
+    """
+    Vector search restricted to the routed categories, unfiltered when routing does not apply.
+
+    The question is embedded at most once (not at all when ``embedding`` is given).
+    """
+    vectorstore = get_vectorstore_service()
+    if embedding is None:
+        embedding = vectorstore.embed_query(question)
+    route = route_query(embedding)
+    if route is not None:
+        routed_top_k = _routed_top_k(top_k)
+        docs = vectorstore.query(question, top_k=routed_top_k, filter=route.filter, embedding=embedding)
+        if _routed_enough(route, docs, routed_top_k):
+            return docs
+    return vectorstore.query(question, top_k=top_k, embedding=embedding)
+
+
+async def avector_search(
+    question: str, top_k: int, embedding: Optional[List[float]] = None
+) -> List[Document]:
+    """Async variant of vector_search."""
+    vectorstore = get_vectorstore_service()
+    if embedding is None:
+        embedding = await vectorstore.aembed_query(question)
+    route = await aroute_query(embedding)
+    if route is not None:
+        routed_top_k = _routed_top_k(top_k)
+        docs = await vectorstore.aquery(question, top_k=routed_top_k, filter=route.filter, embedding=embedding)
+        if _routed_enough(route, docs, routed_top_k):
+            return docs
+    return await vectorstore.aquery(question, top_k=top_k, embedding=embedding)
+
+
+def hybrid_query(question: str, top_k: int, embedding: Optional[List[float]] = None) -> List[Document]:
+    """
+    Retrieve documents for a question using BM25 and/or the vector store.
+
+    Pass the request's question ``embedding`` so the vector search reuses it.
+    """
+    if not settings.HYBRID_RETRIEVAL:
+        return vector_search(question, top_k, embedding)
+
+    lexical_docs, confident = lexical_search(question, top_k)
+    if _lexical_only(confident):
+        return lexical_docs
+
+    vector_docs = vector_search(question, top_k, embedding)
+    return reciprocal_rank_fusion([vector_docs, lexical_docs])[:top_k]
+
+
+async def ahybrid_query(
+    question: str, top_k: int, embedding: Optional[List[float]] = None
+) -> List[Document]:
+    """Async variant of hybrid_query (BM25 is in-process; only the vector search is awaited)."""
+    if not settings.HYBRID_RETRIEVAL:
+        return await avector_search(question, top_k, embedding)
+
+    lexical_docs, confident = lexical_search(question, top_k)
+    if _lexical_only(confident):
+        return lexical_docs
+
+    vector_docs = await avector_search(question, top_k, embedding)
+    return reciprocal_rank_fusion([vector_docs, lexical_docs])[:top_k]
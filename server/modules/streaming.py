@@ -0,0 +1,240 @@
+"""
+Token streaming helpers shared by the Flask and FastAPI streaming endpoints.
+Coalesces LLM tokens into larger writes (by time window or byte count) and
+optionally frames them as Server-Sent Events with heartbeats.
+"""
+
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional, Union
+
+from config import settings
+
+# Yielded by the coalescers when no output was produced for a heartbeat interval
+HEARTBEAT = object()
+
+SSE_HEARTBEAT = ": heartbeat\n\n"
+
+_END = object()
+
+# Tokens the pump thread may read ahead of a slow consumer
+_PUMP_QUEUE_SIZE = 256
+
+
+def sse_event(data: str, event: Optional[str] = None) -> str:
+    """Frame a payload as a single Server-Sent Event."""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+def wants_sse(stream_format: Optional[str], accept: Optional[str]) -> bool:
+    """SSE framing is requested via format=sse or an Accept: text/event-stream header."""
+    if stream_format:
+        return stream_format.lower() == "sse"
+    return bool(accept) and "text/event-stream" in accept
+
+
+def wants_ndjson(response_format: Optional[str], accept: Optional[str]) -> bool:
+    """NDJSON streaming is requested via format=ndjson or an Accept: application/x-ndjson header."""
+    if response_format:
+        return response_format.lower() == "ndjson"
+    return bool(accept) and "application/x-ndjson" in accept
+
+
+class _Coalescer:
+    """Buffers text and decides when to flush it."""
+
+    def __init__(self, flush_interval: float, flush_bytes: int):
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.parts = []
+        self.size = 0
+        self.started = 0.0
+        self.flushed_once = False
+
+    def add(self, text: str):
+        if not self.parts:
+            self.started = time.monotonic()
+        self.parts.append(text)
+        self.size += len(text.encode("utf-8"))
+
+    def due(self) -> bool:
+        if not self.parts:
+            return False
+        # Emit the first token immediately so time-to-first-byte is not delayed
+        return (
+            not self.flushed_once
+            or self.size >= self.flush_bytes
+            or time.monotonic() - self.started >= self.flush_interval
+        )
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the buffered text must be flushed, or None if empty."""
+        if not self.parts:
+            return None
+        return max(0.0, self.flush_interval - (time.monotonic() - self.started))
+
+    def flush(self) -> str:
+        text = "".join(self.parts)
+        self.parts = []
+        self.size = 0
+        self.flushed_once = True
+        return text
+
+
+def _wait_timeout(coalescer: _Coalescer, heartbeat_interval: Optional[float], last_output: float):
+    timeouts = []
+    pending = coalescer.remaining()
+    if pending is not None:
+        timeouts.append(pending)
+    if heartbeat_interval:
+        timeouts.append(max(0.0, heartbeat_interval - (time.monotonic() - last_output)))
+    return min(timeouts) if timeouts else None
+
+
+def coalesce(
+    chunks: Iterable[str],
+    flush_interval: float = None,
+    flush_bytes: int = None,
+    heartbeat_interval: Optional[float] = None,
+) -> Iterator[Union[str, object]]:
+    """
+    Coalesce a blocking token iterator into larger writes.
+
+    The source is drained on a helper thread so buffered text is flushed when
+    the time window expires even if the model stalls, and ``HEARTBEAT`` is
+    yielded after ``heartbeat_interval`` seconds without output. When the
+    consumer stops early (e.g. the client disconnects), the helper stops
+    reading and closes the source, releasing the upstream connection.
+    """
+    flush_interval = settings.STREAM_FLUSH_INTERVAL if flush_interval is None else flush_interval
+    flush_bytes = settings.STREAM_FLUSH_BYTES if flush_bytes is None else flush_bytes
+
+    items: "queue.Queue" = queue.Queue(maxsize=_PUMP_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Bounded put that gives up once the consumer has gone away
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def pump():
+        iterator = iter(chunks)
+        try:
+            for chunk in iterator:
+                if not put(chunk):
+                    break
+        except BaseException as e:
+            put(e)
+        finally:
+            # Close the source on this thread, where it is not executing
+            close = getattr(iterator, "close", None)
+            if stop.is_set() and close is not None:
+                close()
+            put(_END)
+
+    # Run in a copy of the caller's context so log records keep its request ID
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(pump,), name="stream-pump", daemon=True).start()
+
+    coalescer = _Coalescer(flush_interval, flush_bytes)
+    last_output = time.monotonic()
+
+    try:
+        while True:
+            try:
+                item = items.get(timeout=_wait_timeout(coalescer, heartbeat_interval, last_output))
+            except queue.Empty:
+                item = None
+
+            if item is _END:
+                break
+            if isinstance(item, BaseException):
+                if coalescer.parts:
+                    yield coalescer.flush()
+                raise item
+            if item:
+                coalescer.add(item)
+
+            if coalescer.due():
+                yield coalescer.flush()
+                last_output = time.monotonic()
+            elif item is None and heartbeat_interval and time.monotonic() - last_output >= heartbeat_interval:
+                yield HEARTBEAT
+                last_output = time.monotonic()
+    finally:
+        # Also reached on GeneratorExit when the response is closed early
+        stop.set()
+
+    if coalescer.parts:
+        yield coalescer.flush()
+
+
+async def acoalesce(
+    chunks: AsyncIterable[str],
+    flush_interval: float = None,
+    flush_bytes: int = None,
+    heartbeat_interval: Optional[float] = None,
+) -> AsyncIterator[Union[str, object]]:
+    """
+    Async variant of coalesce for async token iterators.
+
+    When the consumer stops early or is cancelled (e.g. the client
+    disconnects), the pending read is cancelled and the source is closed,
+    releasing the upstream connection.
+    """
+    flush_interval = settings.STREAM_FLUSH_INTERVAL if flush_interval is None else flush_interval
+    flush_bytes = settings.STREAM_FLUSH_BYTES if flush_bytes is None else flush_bytes
+
+    iterator = chunks.__aiter__()
+    coalescer = _Coalescer(flush_interval, flush_bytes)
+    last_output = time.monotonic()
+    next_item = asyncio.ensure_future(iterator.__anext__())
+
+    try:
+        while True:
+            # Wait on the same pending __anext__ so timeouts never cancel the source
+            done, _ = await asyncio.wait(
+                {next_item}, timeout=_wait_timeout(coalescer, heartbeat_interval, last_output)
+            )
+
+            item = None
+            if done:
+                try:
+                    item = next_item.result()
+                except StopAsyncIteration:
+                    break
+                except BaseException:
+                    if coalescer.parts:
+                        yield coalescer.flush()
+                    raise
+                next_item = asyncio.ensure_future(iterator.__anext__())
+                if item:
+                    coalescer.add(item)
+
+            if coalescer.due():
+                yield coalescer.flush()
+                last_output = time.monotonic()
+            elif not done and heartbeat_interval and time.monotonic() - last_output >= heartbeat_interval:
+                yield HEARTBEAT
+                last_output = time.monotonic()
+    finally:
+        if not next_item.done():
+            next_item.cancel()
+            # An async generator cannot be closed while its __anext__ is running
+            await asyncio.wait({next_item})
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    if coalescer.parts:
+        yield coalescer.flush()
@@ -0,0 +1,268 @@
+"""
+Startup warm-up.
+Eagerly initializes the service clients and in-memory indexes so the first request
+does not pay for them, precomputes RAG answers for every catalog question, and
+rebuilds those answers in the background whenever the FAQ source changes.
+"""
+
+import fcntl
+import importlib
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from logger import logger
+from modules.faq_loader import DEFAULT_FAQ_PATH, FAQ_ID_PREFIX, get_faq_catalog, sync_faq_index
+from modules.faq_answers import get_faq_answer_index
+from modules.lexical_index import get_lexical_index
+from modules.rag_pipeline import get_rag_pipeline
+from services.answer_cache import get_answer_cache
+from services.llm_service import get_llm_service
+from services.vectorstore_service import get_vectorstore_service
+
+
+# Imported by the services on first use instead of at app import time
+DEFERRED_IMPORTS = ("langchain_groq", "langchain_google_genai", "pinecone")
+
+_ready = threading.Event()
+_init_lock = threading.Lock()
+
+
+def preload():
+    """
+    Build the fork-safe shared state in a pre-fork server's master process.
+
+    Imports the heavy modules the services otherwise defer to first use, and
+    parses the FAQ catalog and builds the BM25 index, so every worker inherits
+    them instead of loading its own. Network clients, the embedding cache's
+    SQLite connection, thread pools and the FAQ warmer do not survive a fork
+    and are left to warm_up() in each worker.
+    """
+    for name in DEFERRED_IMPORTS:
+        importlib.import_module(name)
+    get_faq_catalog().refresh()
+    get_lexical_index()
+    logger.info("Preload: modules, FAQ catalog and BM25 index ready")
+
+
+def init_services() -> bool:
+    """
+    Initialize the service clients and in-memory indexes.
+
+    Returns False, without waiting, when another initialization is in
+    progress or this one fails; readiness is only reported after a success.
+    """
+    if not _init_lock.acquire(blocking=False):
+        return False
+    try:
+        vectorstore = get_vectorstore_service()
+        llm_service = get_llm_service()
+
+        def open_index():
+            if vectorstore.backend == "pinecone":
+                vectorstore.client
+            vectorstore.index
+
+        # The first three also import pinecone, langchain_google_genai and langchain_groq
+        steps = [
+            ("vector_index", open_index),
+            ("embedding_model", lambda: vectorstore.embed_model),
+            ("llm_clients", lambda: (llm_service.get_rag_llm(), llm_service.get_chat_llm())),
+            ("pipeline", get_rag_pipeline),
+            ("lexical_index", get_lexical_index),
+        ]
+        if settings.HYBRID_RETRIEVAL:
+            # Whether BM25-only answers may skip the vector search (PDFs are vector-only)
+            steps.append(("index_contents", lambda: vectorstore.has_documents_outside(FAQ_ID_PREFIX)))
+        if settings.FAQ_DIRECT_ANSWERS:
+            steps.append(("faq_answer_index", lambda: get_faq_answer_index().build()))
+
+        # Startup profile: one record with the time spent in each step
+        step_ms = {}
+        for name, step in steps:
+            started = time.perf_counter()
+            step()
+            step_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info("Services initialized in %.0f ms", sum(step_ms.values()), extra={"step_ms": step_ms})
+        _ready.set()
+        return True
+    except Exception:
+        logger.exception("Service initialization failed; services will initialize lazily")
+        return False
+    finally:
+        _init_lock.release()
+
+
+def is_ready() -> bool:
+    """
+    True once warm-up has initialized the services.
+
+    Always True when warm-up is disabled: the services then initialize lazily
+    on first use and there is nothing to wait for.
+    """
+    return _ready.is_set() or not settings.WARMUP_ON_STARTUP
+
+
+def warm_up():
+    """
+    Initialize clients and indexes, then start the background answer warmer.
+
+    Failures are logged rather than raised; anything not warmed here is still
+    initialized lazily on first use.
+    """
+    logger.info("Warm-up: initializing services")
+    init_services()
+    get_faq_warmer().start()
+    logger.info("Warm-up: services ready")
+
+
+def precompute_answers() -> int:
+    """
+    Pin answers for every canonical FAQ question in the answer cache.
+
+    Answers are generated once per FAQ catalog version and saved to
+    PRECOMPUTED_ANSWERS_PATH. The first process to take the file lock generates
+    them; every other worker, including ones recycled later, waits for it and
+    loads the saved answers instead of calling the LLM again.
+
+    Returns:
+        Number of answers pinned
+    """
+    snapshot = get_faq_catalog().snapshot()
+    questions = [doc.metadata["question"] for doc in snapshot.documents]
+    path = Path(settings.PRECOMPUTED_ANSWERS_PATH)
+
+    with _file_lock(path.with_suffix(path.suffix + ".lock")):
+        answers = _load_answers(path, snapshot.version)
+        if answers is None:
+            answers = _generate_answers(questions)
+            # A partial set is not saved, so the next worker retries the failures
+            if len(answers) == len(questions):
+                _save_answers(path, snapshot.version, answers)
+        else:
+            logger.info(f"Loaded {len(answers)} precomputed FAQ answers from {path}")
+
+    pinned = list(answers)
+    vectors = get_vectorstore_service().embed_queries(pinned)
+    answer_cache = get_answer_cache()
+    for question, vector in zip(pinned, vectors):
+        answer_cache.store(question, vector, answers[question], pinned=True)
+    return len(pinned)
+
+
+def _generate_answers(questions: List[str]) -> Dict[str, Dict[str, Any]]:
+    answers = {}
+    for question in questions:
+        try:
+            answers[question] = get_rag_pipeline().answer(question, use_cache=False)
+        except Exception:
+            logger.exception(f"Failed to precompute answer for: {question}")
+
+    logger.info(f"Precomputed {len(answers)}/{len(questions)} FAQ answers")
+    return answers
+
+
+def _load_answers(path: Path, version: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Saved answers for a catalog version, or None when missing, stale or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logger.warning(f"Ignoring unreadable precomputed answers at {path}")
+        return None
+    return data["answers"] if data.get("version") == version else None
+
+
+def _save_answers(path: Path, version: str, answers: Dict[str, Dict[str, Any]]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "answers": answers}, f)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Exclusive lock across processes (workers of one server share the file)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class FAQWarmer:
+    """
+    Background worker keeping precomputed answers in sync with the FAQ source.
+
+    Checks the FAQ catalog for a new version every ``poll_interval`` seconds
+    (0 disables polling) and rebuilds only after a change. Other ingests (PDF
+    uploads) leave the pinned answers in the answer cache alone.
+    """
+
+    def __init__(self, faq_path: Path, poll_interval: float):
+        self.faq_path = Path(faq_path)
+        self.poll_interval = poll_interval
+        self._rebuild = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._version = get_faq_catalog(str(self.faq_path)).version
+
+    def start(self):
+        """Start the worker thread (idempotent)."""
+        if self._thread is not None:
+            return
+        if settings.WARMUP_PRECOMPUTE_ANSWERS:
+            self._rebuild.set()
+        self._thread = threading.Thread(target=self._run, name="faq-warmer", daemon=True)
+        self._thread.start()
+
+    def request_rebuild(self):
+        """Schedule a rebuild of the precomputed answers."""
+        self._rebuild.set()
+
+    def _run(self):
+        while True:
+            self._rebuild.wait(timeout=self.poll_interval or None)
+            try:
+                if self._source_changed():
+                    self._on_source_changed()
+                if self._rebuild.is_set():
+                    self._rebuild.clear()
+                    if settings.WARMUP_PRECOMPUTE_ANSWERS:
+                        precompute_answers()
+            except Exception:
+                logger.exception("FAQ warmer iteration failed")
+
+    def _source_changed(self) -> bool:
+        # Compare catalog versions rather than reloading here: a request may
+        # already have picked up the new file
+        catalog = get_faq_catalog(str(self.faq_path))
+        catalog.refresh(force=True)
+        if catalog.version == self._version:
+            return False
+        self._version = catalog.version
+        return True
+
+    def _on_source_changed(self):
+        # The lexical and direct-answer indexes follow the catalog version on their own
+        logger.info(f"FAQ source changed: {self.faq_path}")
+        get_answer_cache().invalidate()
+        if settings.FAQ_AUTO_SYNC:
+            sync_faq_index(str(self.faq_path))
+        self._rebuild.set()
+
+
+@lru_cache()
+def get_faq_warmer() -> FAQWarmer:
+    """Get singleton FAQ warmer."""
+    return FAQWarmer(DEFAULT_FAQ_PATH, settings.FAQ_WATCH_INTERVAL)
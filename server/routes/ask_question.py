@@ -1,45 +1,177 @@
-from fastapi import APIRouter, Form, HTTPException
-from modules.llm import get_llm_agent
-from modules.query_handlers import query_agent
-from langchain_core.documents import Document
-from langchain_core.retrievers import BaseRetriever
-from pydantic import Field
+import asyncio
+import json
 from typing import List, Optional
+from fastapi import APIRouter, Form, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from modules.rag_pipeline import get_rag_pipeline, validate_batch
+from modules.streaming import acoalesce, sse_event, wants_sse, wants_ndjson, HEARTBEAT, SSE_HEARTBEAT
+from services.llm_service import get_llm_service
+from services.metrics import ERRORS
+from config import settings
 from logger import logger
-from services.vectorstore_service import get_vectorstore_service
 
 router=APIRouter()
 
+
+class BatchQuestions(BaseModel):
+    questions: List[str]
+    response_format: Optional[str] = Field(None, alias="format")
+
+
 @router.post("/ask/")
 async def ask_question(question: str = Form(...)):
     try:
-        logger.info(f"user query: {question}")
+        logger.info("user query: %s", question)
+
+        result = await get_rag_pipeline().aanswer(question)
+
+        logger.info("query successful")
+        return result
+
+    except ValueError as e:
+        logger.warning("Invalid input: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error processing question")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+async def _cancel(task: "asyncio.Task"):
+    """Cancel a background task if it is still running and wait for it to finish."""
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        # Already logged by the stream, or moot once the client is gone
+        pass
 
-        # Use VectorStore service for querying
-        vectorstore = get_vectorstore_service()
-        docs = vectorstore.query(question, top_k=3)
 
-        class SimpleRetriever(BaseRetriever):
-            tags: Optional[List[str]] = Field(default_factory=list)
-            metadata: Optional[dict] = Field(default_factory=dict)
+async def _cancel_on_disconnect(request: Request, task: "asyncio.Task"):
+    """Cancel ``task`` when the client disconnects (for awaits outside a streaming response)."""
+    while not task.done():
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            task.cancel()
 
-            def __init__(self, documents: List[Document]):
-                super().__init__()
-                self._docs = documents
 
-            def _get_relevant_documents(self, query: str) -> List[Document]:
-                return self._docs
+@router.post("/ask/stream")
+async def ask_stream(request: Request):
+    # The form is read by hand: Form(...) parameters are parsed and validated
+    # before the handler runs. Embedding + retrieval start as soon as the
+    # question is known and run while the rest of the request is checked and
+    # the LLM client is acquired
+    form = await request.form()
+    question = form.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise HTTPException(status_code=400, detail="Question is required")
 
-        retriever = SimpleRetriever(docs)
-        agent = get_llm_agent(retriever)
-        result = query_agent(agent, question)
+    pipeline = get_rag_pipeline()
+    prepared = await pipeline.astart_stream(question)
+    try:
+        stream_format = form.get("format")
+        sse = wants_sse(
+            stream_format if isinstance(stream_format, str) else None,
+            request.headers.get("accept")
+        )
+        get_llm_service().get_rag_llm()
+    except Exception:
+        await _cancel(prepared)
+        raise
 
-        logger.info("query successful")
-        return result
+    logger.info("streaming query: %s", question)
+    events = pipeline.astream(prepared)
 
+    async def tokens():
+        async for _, text in events:
+            yield text
+
+    if sse:
+        async def generate():
+            try:
+                _, metadata = await events.__anext__()
+                yield sse_event(json.dumps(metadata), event="sources")
+                heartbeat = settings.STREAM_HEARTBEAT_INTERVAL
+                async for text in acoalesce(tokens(), heartbeat_interval=heartbeat):
+                    yield SSE_HEARTBEAT if text is HEARTBEAT else sse_event(text)
+                yield sse_event("", event="done")
+            except Exception as e:
+                logger.exception("Error in ask_stream")
+                ERRORS.labels(endpoint="ask_stream").inc()
+                yield sse_event(f"Error: {str(e)}", event="error")
+            finally:
+                # Stops retrieval when the client disconnects before it completes
+                await _cancel(prepared)
+
+        return StreamingResponse(
+            generate(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    # Plain text: sources travel in a header, so the response starts only once
+    # retrieval is done (SSE starts it at once). Nothing cancels a handler on
+    # disconnect, so watch for it while waiting
+    watcher = asyncio.ensure_future(_cancel_on_disconnect(request, prepared))
+    try:
+        _, metadata = await events.__anext__()
+    except asyncio.CancelledError:
+        # Re-raise unless the watcher (not the server) cancelled retrieval
+        if asyncio.current_task().cancelling() or not prepared.cancelled():
+            raise
+        logger.info("Client disconnected before retrieval completed")
+        return Response(status_code=499)
+    except Exception:
+        logger.exception("Error in ask_stream")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        await _cancel(watcher)
+
+    async def generate_text():
+        try:
+            async for text in acoalesce(tokens()):
+                yield text
+        except Exception as e:
+            logger.exception("Error in ask_stream")
+            ERRORS.labels(endpoint="ask_stream").inc()
+            yield f"Error: {str(e)}"
+        finally:
+            await _cancel(prepared)
+
+    return StreamingResponse(
+        generate_text(),
+        media_type="text/plain",
+        headers={"X-Answer-Metadata": json.dumps(metadata)}
+    )
+
+
+@router.post("/ask/batch")
+async def ask_batch(body: BatchQuestions, request: Request):
+    try:
+        questions = validate_batch(body.questions)
     except ValueError as e:
-        logger.warning(f"Invalid input: {e}")
+        logger.warning("Invalid batch: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info("batch query: %d questions", len(questions))
+    pipeline = get_rag_pipeline()
+
+    # Stream each answer as it completes on format=ndjson / Accept: application/x-ndjson
+    if wants_ndjson(body.response_format, request.headers.get("accept")):
+        async def generate():
+            async for index, result in pipeline.aanswer_batch(questions):
+                yield json.dumps({"index": index, "question": questions[index], **result}) + "\n"
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    try:
+        results = [None] * len(questions)
+        async for index, result in pipeline.aanswer_batch(questions):
+            results[index] = {"question": questions[index], **result}
+
+        logger.info("batch query successful")
+        return {"results": results}
+
     except Exception as e:
-        logger.exception("Error processing question")
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+        logger.exception("Error processing batch")
+        raise HTTPException(status_code=500, detail="Internal server error")
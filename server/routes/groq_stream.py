@@ -1,70 +1,85 @@
-from fastapi import APIRouter, Form
+from fastapi import APIRouter, Form, Request
 from fastapi.responses import StreamingResponse
 from logger import logger
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-import time
-from typing import Optional, Dict, List
-from threading import Lock
+from langchain_core.messages import HumanMessage
+from typing import Optional
 from services.llm_service import get_llm_service
-from prompts import CLINICBOT_CHAT_PROMPT
+from services.conversation_store import get_conversation_store
+from services.metrics import ERRORS, LLMStreamTimer
+from modules.streaming import acoalesce, sse_event, wants_sse, HEARTBEAT, SSE_HEARTBEAT
+from config import settings
 
 router = APIRouter()
 
-STREAM_DELAY = 0.05  # 50ms delay between chunks
-
-conversation_memory: Dict[str, List] = {}
-memory_lock = Lock()
-
 
 @router.post("/groq_stream/")
 async def groq_stream(
+    request: Request,
     question: str = Form(...),
-    thread_id: Optional[str] = Form(None)
+    thread_id: Optional[str] = Form(None),
+    stream_format: Optional[str] = Form(None, alias="format")
 ):
-    logger.info(f"groq_stream request received - thread_id: {thread_id}")
+    logger.info("groq_stream request received - thread_id: %s", thread_id)
+    
+    # Plain text by default; SSE with heartbeats on format=sse / Accept: text/event-stream
+    sse = wants_sse(stream_format, request.headers.get("accept"))
     
     # Use default thread_id if not provided
     if not thread_id:
         thread_id = "default"
     
-    def token_generator():
+    async def token_generator():
         try:
             # Use LLM service for chat
             llm_service = get_llm_service()
             llm = llm_service.get_chat_llm()
 
-            # Get conversation history for this thread_id (short-term memory)
-            with memory_lock:
-                if thread_id not in conversation_memory:
-                    # Initialize with system message
-                    conversation_memory[thread_id] = [
-                        SystemMessage(content=CLINICBOT_CHAT_PROMPT)
-                    ]
-
-                messages = list(conversation_memory[thread_id])
+            # Get bounded conversation history for this thread_id (short-term memory)
+            conversations = get_conversation_store()
+            messages = conversations.get_messages(thread_id)
             
             # Add the new user message
             messages.append(HumanMessage(content=question))
             
-            # Stream the response token by token
-            full_response = ""
-            for chunk in llm.stream(messages):
-                if hasattr(chunk, "content") and chunk.content:
-                    content = chunk.content
-                    full_response += content
-                    yield content
-                    time.sleep(STREAM_DELAY)
+            # Stream the response, coalescing tokens into larger writes
+            parts = []
+            timer = LLMStreamTimer("groq_stream")
+
+            async def tokens():
+                async for chunk in llm.astream(messages):
+                    if hasattr(chunk, "content") and chunk.content:
+                        timer.mark_token()
+                        parts.append(chunk.content)
+                        yield chunk.content
+
+            heartbeat = settings.STREAM_HEARTBEAT_INTERVAL if sse else None
+            async for text in acoalesce(tokens(), heartbeat_interval=heartbeat):
+                if text is HEARTBEAT:
+                    yield SSE_HEARTBEAT
+                else:
+                    yield sse_event(text) if sse else text
+
+            full_response = "".join(parts)
+            timer.finish(messages, full_response)
             
             # Add both user message and AI response
-            with memory_lock:
-                conversation_memory[thread_id].append(HumanMessage(content=question))
-                conversation_memory[thread_id].append(AIMessage(content=full_response))
+            conversations.append_turn(thread_id, question, full_response)
+
+            if sse:
+                yield sse_event("", event="done")
             
         except Exception as e:
             logger.exception("Error in groq_stream")
+            ERRORS.labels(endpoint="groq_stream").inc()
             error_msg = f"Error: {str(e)}"
-            yield error_msg
+            yield sse_event(error_msg, event="error") if sse else error_msg
 
+    if sse:
+        return StreamingResponse(
+            token_generator(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
     return StreamingResponse(token_generator(), media_type="text/plain")
 
 
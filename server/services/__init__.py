@@ -4,11 +4,24 @@ Services module for centralized external dependency management.
 
 from .vectorstore_service import get_vectorstore_service, VectorStoreService
 from .llm_service import get_llm_service, LLMService
+from .local_index import LocalVectorIndex
+from .embedding_cache import EmbeddingCache
+from .answer_cache import get_answer_cache, SemanticAnswerCache
+from .conversation_store import get_conversation_store, ConversationStore
+from .singleflight import SingleFlight, AsyncSingleFlight
 
 __all__ = [
     'get_vectorstore_service',
     'VectorStoreService',
     'get_llm_service',
     'LLMService',
+    'LocalVectorIndex',
+    'EmbeddingCache',
+    'get_answer_cache',
+    'SemanticAnswerCache',
+    'get_conversation_store',
+    'ConversationStore',
+    'SingleFlight',
+    'AsyncSingleFlight',
 ]
 
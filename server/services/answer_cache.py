@@ -0,0 +1,172 @@
+"""
+Semantic answer cache for the RAG endpoints.
+Returns a previously generated answer when a new question embeds close enough to an
+already answered one, so paraphrased questions skip the LLM call entirely.
+"""
+
+import time
+from collections import OrderedDict
+from functools import lru_cache, partial
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import settings
+from logger import logger
+from services.embedding_cache import normalize_query
+from services.metrics import CACHE_HITS, CACHE_MISSES
+from services.vectorstore_service import get_vectorstore_service
+
+
+class SemanticAnswerCache:
+    """
+    Similarity-keyed answer cache.
+
+    Args:
+        threshold: Minimum cosine similarity for a cached answer to be reused
+        max_size: Maximum number of cached answers (LRU eviction)
+        ttl: Entry lifetime in seconds (0 = never expire)
+    """
+
+    def __init__(self, threshold: float = 0.95, max_size: int = 512, ttl: float = 3600):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = Lock()
+        # normalized question -> (created, unit embedding, result, pinned)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._keys: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def _rebuild_matrix(self):
+        self._keys = list(self._entries.keys())
+        self._matrix = (
+            np.stack([self._entries[k][1] for k in self._keys]) if self._keys else None
+        )
+
+    def _evict_expired(self, now: float) -> bool:
+        if self.ttl <= 0:
+            return False
+        expired = [
+            k for k, (created, _, _, pinned) in self._entries.items()
+            if not pinned and now - created > self.ttl
+        ]
+        for key in expired:
+            del self._entries[key]
+        return bool(expired)
+
+    def lookup(self, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a question embedding.
+
+        Returns:
+            A copy of the cached result marked with ``cached: True``, or None
+        """
+        if self.max_size <= 0:
+            return None
+
+        query = _unit(embedding)
+        now = time.time()
+
+        with self._lock:
+            if self._evict_expired(now):
+                self._rebuild_matrix()
+
+            if self._matrix is None:
+                self.misses += 1
+                CACHE_MISSES.labels(cache="answer").inc()
+                return None
+
+            scores = self._matrix @ query
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < self.threshold:
+                self.misses += 1
+                CACHE_MISSES.labels(cache="answer").inc()
+                return None
+
+            key = self._keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_HITS.labels(cache="answer").inc()
+            result = self._entries[key][2]
+
+        logger.debug("Answer cache hit (similarity=%.4f)", score)
+        return {**result, "cached": True}
+
+    def store(
+        self,
+        question: str,
+        embedding: List[float],
+        result: Dict[str, Any],
+        pinned: bool = False
+    ):
+        """
+        Cache the answer generated for a question.
+
+        Pinned entries (precomputed catalog answers) are exempt from TTL and
+        LRU eviction and are only dropped by invalidate().
+        """
+        if self.max_size <= 0:
+            return
+
+        key = normalize_query(question)
+        with self._lock:
+            self._entries[key] = (time.time(), _unit(embedding), dict(result), pinned)
+            self._entries.move_to_end(key)
+            self._evict_lru()
+            self._rebuild_matrix()
+
+    def _evict_lru(self):
+        unpinned = [k for k, entry in self._entries.items() if not entry[3]]
+        for key in unpinned[:max(0, len(self._entries) - self.max_size)]:
+            del self._entries[key]
+
+    def invalidate(self, keep_pinned: bool = False):
+        """
+        Drop cached answers (e.g. after the index is re-ingested).
+
+        With ``keep_pinned`` the precomputed catalog answers survive; they are
+        tied to the FAQ catalog version rather than to the index contents.
+        """
+        with self._lock:
+            dropped = [k for k, entry in self._entries.items() if not (keep_pinned and entry[3])]
+            for key in dropped:
+                del self._entries[key]
+            self._rebuild_matrix()
+        logger.info(f"Answer cache invalidated ({len(dropped)} entries dropped)")
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "pinned": sum(1 for entry in self._entries.values() if entry[3]),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _unit(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@lru_cache()
+def get_answer_cache() -> SemanticAnswerCache:
+    """Get singleton answer cache; generated answers are dropped whenever the vector store is re-ingested."""
+    cache = SemanticAnswerCache(
+        threshold=settings.ANSWER_CACHE_THRESHOLD,
+        max_size=settings.ANSWER_CACHE_SIZE,
+        ttl=settings.ANSWER_CACHE_TTL,
+    )
+    get_vectorstore_service().add_ingest_listener(partial(cache.invalidate, keep_pinned=True))
+    return cache
@@ -0,0 +1,157 @@
+"""
+Bounded conversation memory for the streaming chat endpoints.
+Caps the number of live threads (LRU + idle TTL eviction) and keeps each thread's
+history within a token budget, folding trimmed turns into a short rolling summary.
+"""
+
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from typing import Dict, List, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from config import settings
+from logger import logger
+from prompts import CLINICBOT_CHAT_PROMPT
+from services.tokens import estimate_tokens
+
+SUMMARY_PREFIX = "Summary of earlier conversation - the patient previously asked about: "
+
+
+class _Thread:
+    __slots__ = ("turns", "tokens", "summary", "last_used")
+
+    def __init__(self):
+        self.turns: List[Tuple[str, str]] = []
+        self.tokens = 0
+        self.summary: List[str] = []
+        self.last_used = time.monotonic()
+
+
+class ConversationStore:
+    """
+    Thread-safe, bounded per-thread chat history.
+
+    Args:
+        system_prompt: System message prepended to every thread
+        max_threads: Maximum number of live threads (least recently used evicted first)
+        idle_ttl: Seconds of inactivity after which a thread is dropped (0 = never)
+        token_budget: Maximum estimated tokens of history kept per thread
+        summarize: Fold trimmed turns into a rolling summary instead of dropping them
+        summary_budget: Maximum estimated tokens of the rolling summary
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        max_threads: int = 1000,
+        idle_ttl: float = 3600,
+        token_budget: int = 3000,
+        summarize: bool = True,
+        summary_budget: int = 200,
+    ):
+        self.system_prompt = system_prompt
+        self.max_threads = max_threads
+        self.idle_ttl = idle_ttl
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.summary_budget = summary_budget
+        self.evictions = 0
+
+        self._lock = Lock()
+        self._threads: "OrderedDict[str, _Thread]" = OrderedDict()
+
+    def _evict(self, now: float):
+        # Threads are kept in last-used order, so expired ones sit at the front
+        if self.idle_ttl > 0:
+            while self._threads:
+                thread_id, thread = next(iter(self._threads.items()))
+                if now - thread.last_used <= self.idle_ttl:
+                    break
+                del self._threads[thread_id]
+                self.evictions += 1
+        while len(self._threads) > self.max_threads:
+            self._threads.popitem(last=False)
+            self.evictions += 1
+
+    def get_messages(self, thread_id: str) -> List[BaseMessage]:
+        """Return the prompt history for a thread (system prompt, summary, recent turns)."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            thread = self._threads.get(thread_id)
+            if thread is None:
+                return [SystemMessage(content=self.system_prompt)]
+            thread.last_used = now
+            self._threads.move_to_end(thread_id)
+            turns = list(thread.turns)
+            summary = list(thread.summary)
+
+        messages: List[BaseMessage] = [SystemMessage(content=self.system_prompt)]
+        if summary:
+            messages.append(SystemMessage(content=SUMMARY_PREFIX + "; ".join(summary)))
+        for question, answer in turns:
+            messages.append(HumanMessage(content=question))
+            messages.append(AIMessage(content=answer))
+        return messages
+
+    def append_turn(self, thread_id: str, question: str, answer: str):
+        """Record a completed question/answer turn, trimming old turns to the token budget."""
+        now = time.monotonic()
+        with self._lock:
+            thread = self._threads.get(thread_id)
+            if thread is None:
+                thread = self._threads[thread_id] = _Thread()
+            thread.turns.append((question, answer))
+            thread.tokens += estimate_tokens(question) + estimate_tokens(answer)
+            thread.last_used = now
+            self._threads.move_to_end(thread_id)
+
+            # Keep at least the latest turn, even if it alone exceeds the budget
+            while thread.tokens > self.token_budget and len(thread.turns) > 1:
+                old_question, old_answer = thread.turns.pop(0)
+                thread.tokens -= estimate_tokens(old_question) + estimate_tokens(old_answer)
+                if self.summarize:
+                    self._fold_into_summary(thread, old_question)
+
+            self._evict(now)
+
+    def _fold_into_summary(self, thread: _Thread, question: str):
+        thread.summary.append(" ".join(question.split())[:160])
+        while (
+            len(thread.summary) > 1
+            and estimate_tokens("; ".join(thread.summary)) > self.summary_budget
+        ):
+            thread.summary.pop(0)
+
+    def clear(self, thread_id: str):
+        """Forget a thread's history."""
+        with self._lock:
+            self._threads.pop(thread_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Current number of threads and evictions so far."""
+        with self._lock:
+            return {
+                "threads": len(self._threads),
+                "max_threads": self.max_threads,
+                "evictions": self.evictions,
+            }
+
+
+@lru_cache()
+def get_conversation_store() -> ConversationStore:
+    """Get singleton conversation store for the chat endpoints."""
+    logger.info(
+        f"Conversation store: max_threads={settings.CONVERSATION_MAX_THREADS}, "
+        f"idle_ttl={settings.CONVERSATION_IDLE_TTL}s, token_budget={settings.CONVERSATION_TOKEN_BUDGET}"
+    )
+    return ConversationStore(
+        system_prompt=CLINICBOT_CHAT_PROMPT,
+        max_threads=settings.CONVERSATION_MAX_THREADS,
+        idle_ttl=settings.CONVERSATION_IDLE_TTL,
+        token_budget=settings.CONVERSATION_TOKEN_BUDGET,
+        summarize=settings.CONVERSATION_SUMMARY,
+    )
@@ -0,0 +1,240 @@
+"""
+Query embedding cache.
+Bounded in-memory LRU with TTL, plus an optional SQLite tier that survives restarts.
+"""
+
+import asyncio
+import atexit
+import hashlib
+import sqlite3
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+from logger import logger
+from services.metrics import CACHE_HITS, CACHE_MISSES
+
+# Disk writes are buffered and committed together after this many entries or seconds
+DISK_BATCH_SIZE = 64
+DISK_BATCH_INTERVAL = 1.0
+
+# Gemini embeds queries and documents differently; cached vectors are query embeddings
+QUERY_TASK_TYPE = "RETRIEVAL_QUERY"
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text for cache keys (case and whitespace insensitive)."""
+    return " ".join(text.split()).casefold()
+
+
+class EmbeddingCache:
+    """
+    LRU + TTL cache for query embeddings keyed on (model, task type, normalized text).
+
+    Args:
+        max_size: Maximum number of in-memory entries (0 disables the cache)
+        ttl: Entry lifetime in seconds (0 = never expire)
+        path: Optional SQLite file used as a persistent second tier
+    """
+
+    def __init__(self, max_size: int = 2048, ttl: float = 86400, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        # Memory tier; never held during SQLite I/O
+        self._lock = Lock()
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+
+        # Disk tier: writes wait in _pending (readable by get) until the next batch commit
+        self._db_lock = Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pending: Dict[str, Tuple[float, bytes]] = {}
+        self._flushed_at = time.monotonic()
+
+        if path and max_size > 0:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, created REAL NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+            atexit.register(self.flush)
+            logger.info(f"Embedding cache disk tier: {path}")
+
+    @staticmethod
+    def make_key(text: str, model: str, task_type: str = QUERY_TASK_TYPE) -> str:
+        return hashlib.sha256(
+            f"{model}\x00{task_type}\x00{normalize_query(text)}".encode("utf-8")
+        ).hexdigest()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl > 0 and now - created > self.ttl
+
+    def get(self, text: str, model: str, task_type: str = QUERY_TASK_TYPE) -> Optional[List[float]]:
+        """Return the cached embedding or None on a miss."""
+        if not self.enabled:
+            return None
+
+        key = self.make_key(text, model, task_type)
+        embedding = self._memory_get(key)
+        if embedding is None and self._db is not None:
+            embedding = self._disk_get(key)
+        if embedding is None:
+            self._record_miss()
+        return embedding
+
+    async def aget(self, text: str, model: str, task_type: str = QUERY_TASK_TYPE) -> Optional[List[float]]:
+        """Async variant of get; a disk tier lookup runs in a worker thread."""
+        if not self.enabled:
+            return None
+
+        key = self.make_key(text, model, task_type)
+        embedding = self._memory_get(key)
+        if embedding is None and self._db is not None:
+            embedding = await asyncio.to_thread(self._disk_get, key)
+        if embedding is None:
+            self._record_miss()
+        return embedding
+
+    def put(self, text: str, model: str, embedding: List[float], task_type: str = QUERY_TASK_TYPE):
+        """Store an embedding in memory and, if configured, on disk."""
+        if not self.enabled:
+            return
+
+        key = self.make_key(text, model, task_type)
+        now = time.time()
+        vector = list(embedding)
+        with self._lock:
+            self._store(key, now, vector)
+        if self._db is not None:
+            self._disk_put(key, now, vector)
+
+    async def aput(self, text: str, model: str, embedding: List[float], task_type: str = QUERY_TASK_TYPE):
+        """Async variant of put; a disk tier write runs in a worker thread."""
+        if not self.enabled:
+            return
+
+        key = self.make_key(text, model, task_type)
+        now = time.time()
+        vector = list(embedding)
+        with self._lock:
+            self._store(key, now, vector)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_put, key, now, vector)
+
+    def _memory_get(self, key: str) -> Optional[List[float]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[0], now):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        CACHE_HITS.labels(cache="embedding").inc()
+        return entry[1]
+
+    def _disk_get(self, key: str) -> Optional[List[float]]:
+        # Expired rows are left in place; the recomputed embedding replaces them
+        with self._db_lock:
+            row = self._pending.get(key) or self._db.execute(
+                "SELECT created, vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or self._expired(row[0], time.time()):
+            return None
+
+        vector = array("d", row[1]).tolist()
+        with self._lock:
+            self._store(key, row[0], vector)
+            self.hits += 1
+            self.disk_hits += 1
+        CACHE_HITS.labels(cache="embedding").inc()
+        return vector
+
+    def _disk_put(self, key: str, created: float, vector: List[float]):
+        with self._db_lock:
+            self._pending[key] = (created, array("d", vector).tobytes())
+            if (
+                len(self._pending) >= DISK_BATCH_SIZE
+                or time.monotonic() - self._flushed_at >= DISK_BATCH_INTERVAL
+            ):
+                self._write_pending()
+
+    def _write_pending(self):
+        # Caller holds _db_lock
+        if self._pending:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, created, vector) VALUES (?, ?, ?)",
+                [(key, created, blob) for key, (created, blob) in self._pending.items()],
+            )
+            self._db.commit()
+            self._pending.clear()
+        self._flushed_at = time.monotonic()
+
+    def _record_miss(self):
+        with self._lock:
+            self.misses += 1
+        CACHE_MISSES.labels(cache="embedding").inc()
+
+    def flush(self):
+        """Commit buffered disk writes (also run at interpreter exit)."""
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._write_pending()
+
+    def _store(self, key: str, created: float, vector: List[float]):
+        self._entries[key] = (created, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(
+        self,
+        text: str,
+        model: str,
+        compute: Callable[[str], List[float]],
+        task_type: str = QUERY_TASK_TYPE
+    ) -> List[float]:
+        """Return the cached embedding, computing and storing it on a miss."""
+        embedding = self.get(text, model, task_type)
+        if embedding is None:
+            embedding = compute(text)
+            self.put(text, model, embedding, task_type)
+        return embedding
+
+    def clear(self):
+        """Drop all cached embeddings (memory and disk)."""
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._pending.clear()
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,83 @@
+"""
+Local ingestion manifest.
+Records which content-hash vector IDs (and metadata hashes) have been written to each
+index, so re-ingesting only embeds new chunks and deletes vectors that disappeared.
+"""
+
+import json
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict
+
+from logger import logger
+
+
+class IngestManifest:
+    """
+    JSON manifest of ingested vectors.
+
+    Layout: ``{scope: {id_prefix: {vector_id: metadata_hash}}}`` where the scope
+    identifies the backend and index the vectors were written to, plus
+    ``{"_migrations": {scope: [name]}}`` for one-time index migrations applied.
+    """
+
+    MIGRATIONS_KEY = "_migrations"
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = Lock()
+        self._data: Dict[str, Dict[str, Any]] = {}
+        self._mtime_ns = 0
+        self._reload()
+
+    def _reload(self):
+        # Caller holds _lock (or is __init__); other processes may have saved since
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime_ns == self._mtime_ns:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+            self._mtime_ns = mtime_ns
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable ingest manifest at {self.path}")
+
+    def get(self, scope: str, id_prefix: str) -> Dict[str, str]:
+        """Return the recorded {vector_id: metadata_hash} entries for a prefix."""
+        with self._lock:
+            self._reload()
+            return dict(self._data.get(scope, {}).get(id_prefix, {}))
+
+    def set(self, scope: str, id_prefix: str, entries: Dict[str, str]):
+        """Replace the entries for a prefix and persist the manifest."""
+        with self._lock:
+            self._reload()
+            self._data.setdefault(scope, {})[id_prefix] = dict(entries)
+            self._save()
+
+    def migrated(self, scope: str, name: str) -> bool:
+        """Whether a one-time migration has been applied to a scope."""
+        with self._lock:
+            self._reload()
+            return name in self._data.get(self.MIGRATIONS_KEY, {}).get(scope, [])
+
+    def mark_migrated(self, scope: str, name: str):
+        """Record a one-time migration as applied to a scope and persist the manifest."""
+        with self._lock:
+            self._reload()
+            applied = self._data.setdefault(self.MIGRATIONS_KEY, {}).setdefault(scope, [])
+            if name not in applied:
+                applied.append(name)
+                self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f)
+        os.replace(tmp_path, self.path)
+        self._mtime_ns = self.path.stat().st_mtime_ns
@@ -1,68 +1,163 @@
 """
 Centralized LLM Service for ChatGroq operations.
 Provides factory methods for creating LLM instances with different configurations.
+Instances are cached per configuration and share one pooled HTTP client, so
+requests reuse keep-alive connections to Groq instead of re-handshaking.
 """
 
 from functools import lru_cache
-from langchain_groq import ChatGroq
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+import httpx
 
 from config import settings
 from logger import logger
 
+# langchain_groq (and the groq SDK) is imported when the first client is created
+if TYPE_CHECKING:
+    from langchain_groq import ChatGroq
+
+
+def _pool_connections(client: Any) -> Optional[Dict[str, int]]:
+    """Connection counts from an httpx client's connection pool, when available."""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return None
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {"connections": len(connections), "idle": idle, "active": len(connections) - idle}
+
 
 class LLMService:
     """Centralized service for LLM operations."""
-    
+
+    def __init__(self):
+        self._lock = Lock()
+        self._clients: Dict[Tuple[str, float, bool], "ChatGroq"] = {}
+        self._hits = 0
+        self._misses = 0
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY
+        )
+
     @staticmethod
+    def _timeout() -> httpx.Timeout:
+        return httpx.Timeout(settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT)
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """Pooled sync HTTP client shared by every ChatGroq instance."""
+        if self._http_client is None:
+            self._http_client = httpx.Client(limits=self._limits(), timeout=self._timeout())
+        return self._http_client
+
+    @property
+    def http_async_client(self) -> httpx.AsyncClient:
+        """Pooled async HTTP client shared by every ChatGroq instance."""
+        if self._http_async_client is None:
+            self._http_async_client = httpx.AsyncClient(limits=self._limits(), timeout=self._timeout())
+        return self._http_async_client
+
     def get_llm(
+        self,
         temperature: float = 0.1,
         streaming: bool = False,
         model: str = None
-    ) -> ChatGroq:
+    ) -> "ChatGroq":
         """
         Get a ChatGroq LLM instance.
-        
+
+        Instances are cached by (model, temperature, streaming); ChatGroq holds
+        no per-request state, so one instance is safely shared across threads.
+
         Args:
             temperature: Controls randomness (0.0 = deterministic, 1.0 = creative)
             streaming: Enable streaming responses
             model: Model name (defaults to settings.LLM_MODEL)
-        
+
         Returns:
             Configured ChatGroq instance
         """
         model_name = model or settings.LLM_MODEL
-        logger.debug(f"Creating LLM instance: {model_name}, temp={temperature}, streaming={streaming}")
-        
-        return ChatGroq(
-            groq_api_key=settings.GROQ_API_KEY,
-            model_name=model_name,
-            temperature=temperature,
-            streaming=streaming
-        )
-    
-    @staticmethod
-    def get_rag_llm() -> ChatGroq:
+        key = (model_name, float(temperature), bool(streaming))
+
+        llm = self._clients.get(key)
+        if llm is not None:
+            self._hits += 1
+            return llm
+
+        with self._lock:
+            llm = self._clients.get(key)
+            if llm is None:
+                logger.debug("Creating LLM instance: %s, temp=%s, streaming=%s", model_name, temperature, streaming)
+                from langchain_groq import ChatGroq
+                llm = ChatGroq(
+                    groq_api_key=settings.GROQ_API_KEY,
+                    model_name=model_name,
+                    temperature=temperature,
+                    streaming=streaming,
+                    request_timeout=settings.LLM_TIMEOUT,
+                    max_retries=settings.LLM_MAX_RETRIES,
+                    http_client=self.http_client,
+                    http_async_client=self.http_async_client
+                )
+                self._clients[key] = llm
+                self._misses += 1
+            else:
+                self._hits += 1
+        return llm
+
+    def get_rag_llm(self) -> "ChatGroq":
         """
         Get LLM configured for RAG (low temperature for accuracy).
-        
+
         Returns:
             ChatGroq instance optimized for RAG
         """
-        return LLMService.get_llm(temperature=0.1, streaming=False)
-    
-    @staticmethod
-    def get_chat_llm() -> ChatGroq:
+        return self.get_llm(temperature=0.1, streaming=False)
+
+    def get_chat_llm(self) -> "ChatGroq":
         """
         Get LLM configured for chat (moderate temperature for conversation).
-        
+
         Returns:
             ChatGroq instance optimized for conversational chat
         """
-        return LLMService.get_llm(temperature=0.5, streaming=True)
+        return self.get_llm(temperature=0.5, streaming=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Client registry and HTTP connection pool statistics."""
+        return {
+            "clients": len(self._clients),
+            "hits": self._hits,
+            "misses": self._misses,
+            "max_connections": settings.LLM_POOL_MAX_CONNECTIONS,
+            "max_keepalive": settings.LLM_POOL_MAX_KEEPALIVE,
+            "sync_pool": _pool_connections(self._http_client),
+            "async_pool": _pool_connections(self._http_async_client),
+        }
+
+    async def aclose(self):
+        """Close the pooled HTTP clients (cached LLM instances are dropped)."""
+        with self._lock:
+            self._clients.clear()
+            http_client, self._http_client = self._http_client, None
+            http_async_client, self._http_async_client = self._http_async_client, None
+        if http_client is not None:
+            http_client.close()
+        if http_async_client is not None:
+            await http_async_client.aclose()
 
 
 @lru_cache()
 def get_llm_service() -> LLMService:
     """Get singleton LLM service instance."""
     return LLMService()
-
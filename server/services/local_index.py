@@ -0,0 +1,518 @@
+"""
+In-process NumPy vector index.
+Implements the subset of the Pinecone Index API used by VectorStoreService so the
+whole retrieval stack can run locally (no network round-trip per query).
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from threading import RLock
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from logger import logger
+
+
+class LocalVectorIndex:
+    """
+    Cosine-similarity vector index held in memory.
+
+    Vectors are L2-normalised on insert so a query is a single matrix-vector
+    product followed by a partial sort. When ``path`` is set, the index is
+    persisted as a snapshot directory (``vectors.npy`` + ``meta.json``) named
+    by ``path/CURRENT`` and reloaded memory-mapped, so startup does not copy
+    the matrix into RAM. Writes append into a growable buffer and only mark
+    the index dirty; call ``flush()`` to write the snapshot (VectorStoreService
+    does once per ingest). Replacing existing rows copies the matrix first, so
+    a query never sees a row change under it.
+
+    For large corpora an optional IVF (inverted file) ANN mode clusters the
+    vectors with spherical k-means and only scores the ``nprobe`` closest
+    clusters at query time. Clustering runs on a background thread (queries
+    scan exactly until it is ready); appended vectors join their nearest
+    cluster and the clusters are retrained once the index has doubled.
+
+    Queries accept a Pinecone-style metadata ``filter``; rows are looked up in
+    per-field partitions (value -> row ids) built lazily after writes, and the
+    filtered rows are searched exactly.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    META_FILE = "meta.json"
+    CURRENT_FILE = "CURRENT"
+    SNAPSHOT_PREFIX = "snapshot-"
+
+    def __init__(
+        self,
+        dimension: int,
+        path: Optional[str] = None,
+        ann: bool = False,
+        ann_min_size: int = 10000,
+        nprobe: int = 8,
+    ):
+        self.dimension = dimension
+        self.path = Path(path) if path else None
+        self.ann = ann
+        self.ann_min_size = ann_min_size
+        self.nprobe = nprobe
+
+        self._lock = RLock()
+        # Live rows are a view of the first len(ids) rows of a larger buffer
+        self._buffer = np.empty((0, dimension), dtype=np.float32)
+        self._vectors = self._buffer
+        self._dirty = False
+        self._ids: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+
+        # IVF state, trained in the background; _ivf_size is the row count it was
+        # trained on and _ivf_generation changes whenever rows move or are replaced
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: Optional[List[np.ndarray]] = None
+        self._ivf_size = 0
+        self._ivf_generation = 0
+        self._ivf_building = False
+
+        # Metadata partitions (field -> value -> rows), rebuilt lazily after writes
+        self._partitions: Dict[str, Dict[Any, np.ndarray]] = {}
+
+        if self.path is not None:
+            self._load_snapshot()
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _snapshot_dir(self) -> Path:
+        # Older indexes kept the two files directly in path, without CURRENT
+        try:
+            return self.path / (self.path / self.CURRENT_FILE).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return self.path
+
+    def _load_snapshot(self):
+        directory = self._snapshot_dir()
+        vectors_path = directory / self.VECTORS_FILE
+        meta_path = directory / self.META_FILE
+        if not (vectors_path.exists() and meta_path.exists()):
+            return
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        vectors = np.load(vectors_path, mmap_mode="r")
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"Local index snapshot dimension {vectors.shape[1]} does not match "
+                f"EMBEDDING_DIMENSION {self.dimension}"
+            )
+
+        self._buffer = self._vectors = vectors
+        self._ids = meta["ids"]
+        self._metadata = meta["metadata"]
+        self._positions = {id_val: i for i, id_val in enumerate(self._ids)}
+        logger.info(f"Loaded local index snapshot with {len(self._ids)} vectors from {self.path}")
+
+    def _save_snapshot(self):
+        if self.path is None:
+            return
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        previous = self._snapshot_dir()
+        name = f"{self.SNAPSHOT_PREFIX}{time.time_ns()}"
+        directory = self.path / name
+        directory.mkdir()
+
+        with open(directory / self.VECTORS_FILE, "wb") as f:
+            np.save(f, np.ascontiguousarray(self._vectors))
+        with open(directory / self.META_FILE, "w", encoding="utf-8") as f:
+            json.dump({"ids": self._ids, "metadata": self._metadata}, f)
+
+        # Both files switch in one atomic rename of CURRENT, so a reader never
+        # pairs the vectors of one snapshot with the metadata of another
+        current_tmp = self.path / f"{self.CURRENT_FILE}.{os.getpid()}.tmp"
+        current_tmp.write_text(name, encoding="utf-8")
+        os.replace(current_tmp, self.path / self.CURRENT_FILE)
+
+        # The previous snapshot stays for readers that resolved CURRENT just before the swap
+        for stale in self.path.glob(f"{self.SNAPSHOT_PREFIX}*"):
+            if stale not in (directory, previous):
+                shutil.rmtree(stale, ignore_errors=True)
+        if previous != self.path:
+            for legacy in (self.VECTORS_FILE, self.META_FILE):
+                (self.path / legacy).unlink(missing_ok=True)
+
+    def flush(self):
+        """Write pending changes as a new snapshot (no-op when nothing changed)."""
+        with self._lock:
+            if self._dirty:
+                self._save_snapshot()
+                self._dirty = False
+
+    def _copy_vectors(self) -> np.ndarray:
+        """
+        Give the index a private copy of its rows before replacing some in place.
+
+        Queries score the matrix outside the lock, so existing rows are never
+        written to (this also detaches from a read-only memory map).
+        """
+        self._buffer = self._vectors = np.array(self._vectors, dtype=np.float32)
+        return self._vectors
+
+    def _append_rows(self, rows: np.ndarray):
+        """Append rows into spare buffer capacity, doubling the buffer when it is full."""
+        size = len(self._vectors)
+        needed = size + len(rows)
+        if needed > len(self._buffer) or not self._buffer.flags.writeable:
+            buffer = np.empty((max(needed, 2 * len(self._buffer), 1024), self.dimension), dtype=np.float32)
+            buffer[:size] = self._vectors
+            self._buffer = buffer
+        self._buffer[size:needed] = rows
+        # A new view: queries holding the previous one keep a consistent matrix
+        self._vectors = self._buffer[:needed]
+
+    # ------------------------------------------------------------------
+    # Pinecone-compatible API
+    # ------------------------------------------------------------------
+
+    def upsert(self, vectors: Iterable, **kwargs) -> Dict[str, int]:
+        """Insert or replace vectors given as ``(id, values, metadata)`` tuples or dicts."""
+        new_ids, new_values, new_metadata = [], [], []
+        for item in vectors:
+            if isinstance(item, dict):
+                id_val, values, metadata = item["id"], item["values"], item.get("metadata", {})
+            else:
+                id_val, values, metadata = item[0], item[1], item[2] if len(item) > 2 else {}
+            new_ids.append(id_val)
+            new_values.append(values)
+            new_metadata.append(dict(metadata or {}))
+
+        if not new_ids:
+            return {"upserted_count": 0}
+
+        matrix = _normalize(np.asarray(new_values, dtype=np.float32))
+        if matrix.shape[1] != self.dimension:
+            raise ValueError(
+                f"Vector dimension {matrix.shape[1]} does not match index dimension {self.dimension}"
+            )
+
+        with self._lock:
+            appended_rows, appended_ids, appended_metadata = [], [], []
+            replaced = False
+            for row, id_val, metadata in zip(matrix, new_ids, new_metadata):
+                pos = self._positions.get(id_val)
+                if pos is not None:
+                    if not replaced:
+                        self._copy_vectors()
+                        self._metadata = list(self._metadata)
+                        replaced = True
+                    self._vectors[pos] = row
+                    self._metadata[pos] = metadata
+                else:
+                    self._positions[id_val] = len(self._ids) + len(appended_ids)
+                    appended_rows.append(row)
+                    appended_ids.append(id_val)
+                    appended_metadata.append(metadata)
+
+            start = len(self._ids)
+            if appended_rows:
+                self._append_rows(np.stack(appended_rows))
+                self._ids.extend(appended_ids)
+                self._metadata.extend(appended_metadata)
+
+            if replaced:
+                self._invalidate_ann()
+            else:
+                self._extend_ann(start)
+            self._partitions = {}
+            self._dirty = True
+
+        return {"upserted_count": len(new_ids)}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False, **kwargs):
+        """Delete vectors by id, or clear the whole index."""
+        with self._lock:
+            if delete_all:
+                keep = []
+            else:
+                drop = {self._positions[i] for i in ids or [] if i in self._positions}
+                if not drop:
+                    return {}
+                keep = [i for i in range(len(self._ids)) if i not in drop]
+
+            self._buffer = self._vectors = np.array(self._vectors[keep], dtype=np.float32).reshape(-1, self.dimension)
+            self._ids = [self._ids[i] for i in keep]
+            self._metadata = [self._metadata[i] for i in keep]
+            self._positions = {id_val: i for i, id_val in enumerate(self._ids)}
+
+            self._invalidate_ann()
+            self._partitions = {}
+            self._dirty = True
+        return {}
+
+    def update(
+        self,
+        id: str,
+        values: Optional[List[float]] = None,
+        set_metadata: Optional[Dict[str, Any]] = None,
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """Update a vector's values and/or merge new metadata keys into it."""
+        with self._lock:
+            pos = self._positions.get(id)
+            if pos is None:
+                return {}
+            if values is not None:
+                row = _normalize(np.asarray(values, dtype=np.float32).reshape(1, -1))[0]
+                self._copy_vectors()[pos] = row
+                self._invalidate_ann()
+            if set_metadata:
+                self._metadata = list(self._metadata)
+                self._metadata[pos] = {**self._metadata[pos], **set_metadata}
+                self._partitions = {}
+            self._dirty = True
+        return {}
+
+    def list(self, prefix: Optional[str] = None, limit: int = 100, **kwargs) -> Iterator[List[str]]:
+        """Yield pages of stored ids starting with ``prefix`` (Pinecone's ``Index.list``)."""
+        with self._lock:
+            ids = [id_val for id_val in self._ids if prefix is None or id_val.startswith(prefix)]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def fetch(self, ids: List[str], **kwargs) -> Dict[str, Any]:
+        """Fetch stored vectors and metadata by id."""
+        with self._lock:
+            found = {}
+            for id_val in ids:
+                pos = self._positions.get(id_val)
+                if pos is not None:
+                    found[id_val] = {
+                        "id": id_val,
+                        "values": self._vectors[pos].tolist(),
+                        "metadata": self._metadata[pos],
+                    }
+        return {"vectors": found}
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int = 3,
+        include_metadata: bool = True,
+        include_values: bool = False,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """
+        Return the ``top_k`` most similar vectors by cosine similarity.
+
+        ``filter`` restricts the search to rows whose metadata matches, e.g.
+        ``{"category": "Billing"}`` or ``{"category": {"$nin": ["Parking"]}}``.
+        """
+        q = _normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+
+        with self._lock:
+            vectors, ids, metadata = self._vectors, self._ids, self._metadata
+            ivf = None
+            if filter:
+                candidates = self._filter_rows(filter)
+            else:
+                candidates = None
+                ivf = self._ann_state() if self._use_ann() else None
+
+        if ivf is not None:
+            candidates = _probe(ivf, q, self.nprobe)
+
+        if len(ids) == 0 or top_k <= 0:
+            return {"matches": [], "namespace": ""}
+
+        if candidates is None:
+            scores = vectors @ q
+            rows = _top_k(scores, top_k)
+            row_scores = scores[rows]
+        else:
+            cand_scores = vectors[candidates] @ q
+            order = _top_k(cand_scores, top_k)
+            rows = candidates[order]
+            row_scores = cand_scores[order]
+
+        matches = []
+        for row, score in zip(rows, row_scores):
+            match = {"id": ids[row], "score": float(score)}
+            if include_metadata:
+                match["metadata"] = metadata[row]
+            if include_values:
+                match["values"] = vectors[row].tolist()
+            matches.append(match)
+
+        return {"matches": matches, "namespace": ""}
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        """Summary statistics in the same shape as Pinecone's response."""
+        with self._lock:
+            count = len(self._ids)
+        return {
+            "dimension": self.dimension,
+            "index_fullness": 0.0,
+            "total_vector_count": count,
+            "namespaces": {"": {"vector_count": count}},
+            "ann": self._lists is not None,
+        }
+
+    # ------------------------------------------------------------------
+    # Metadata filtering
+    # ------------------------------------------------------------------
+
+    def _partition(self, field: str) -> Dict[Any, np.ndarray]:
+        """Rows per value of a metadata field (list values index every element)."""
+        partition = self._partitions.get(field)
+        if partition is None:
+            rows: Dict[Any, List[int]] = {}
+            for row, metadata in enumerate(self._metadata):
+                value = metadata.get(field)
+                for item in value if isinstance(value, list) else [value]:
+                    if item is not None:
+                        rows.setdefault(item, []).append(row)
+            partition = {value: np.asarray(r, dtype=np.int64) for value, r in rows.items()}
+            self._partitions[field] = partition
+        return partition
+
+    def _filter_rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        """
+        Sorted rows matching a filter; conditions on several fields are ANDed.
+
+        Supports ``$eq``, ``$in``, ``$ne`` and ``$nin`` (a bare value means
+        ``$eq``). Rows without the field never match ``$eq``/``$in`` and always
+        match ``$ne``/``$nin``.
+        """
+        all_rows = np.arange(len(self._ids))
+        rows = all_rows
+        for field, condition in filter.items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            partition = self._partition(field)
+            for op, operand in condition.items():
+                if op in ("$eq", "$ne"):
+                    values = [operand]
+                elif op in ("$in", "$nin"):
+                    values = list(operand)
+                else:
+                    raise ValueError(f"Unsupported metadata filter operator: {op}")
+                matched = [partition[v] for v in values if v in partition]
+                matched = np.unique(np.concatenate(matched)) if matched else np.empty(0, dtype=np.int64)
+                if op in ("$ne", "$nin"):
+                    matched = np.setdiff1d(all_rows, matched, assume_unique=True)
+                rows = np.intersect1d(rows, matched, assume_unique=True)
+        return rows
+
+    # ------------------------------------------------------------------
+    # Approximate nearest neighbour (IVF)
+    # ------------------------------------------------------------------
+
+    def _use_ann(self) -> bool:
+        return self.ann and len(self._ids) >= self.ann_min_size
+
+    def _invalidate_ann(self):
+        """Drop the IVF after rows moved or were replaced; the next query schedules a rebuild."""
+        self._centroids = None
+        self._lists = None
+        self._ivf_generation += 1
+
+    def _ann_state(self) -> Optional[Tuple[np.ndarray, List[np.ndarray]]]:
+        """Current (centroids, lists), scheduling a background (re)build when missing or outgrown."""
+        if self._lists is None or len(self._ids) >= 2 * self._ivf_size:
+            self._schedule_ivf_build()
+        if self._lists is None:
+            return None
+        return self._centroids, self._lists
+
+    def _extend_ann(self, start: int):
+        """Add the rows appended from ``start`` to their nearest IVF lists."""
+        if self._lists is None or start >= len(self._ids):
+            return
+        assign = np.argmax(self._vectors[start:] @ self._centroids.T, axis=1)
+        rows = np.arange(start, len(self._ids))
+        # New list objects so queries holding the old ones are unaffected
+        self._lists = [
+            np.concatenate([members, rows[assign == c]]) if np.any(assign == c) else members
+            for c, members in enumerate(self._lists)
+        ]
+
+    def _schedule_ivf_build(self):
+        if self._ivf_building:
+            return
+        self._ivf_building = True
+        threading.Thread(target=self._build_ivf, name="ivf-build", daemon=True).start()
+
+    def _build_ivf(self, iterations: int = 10, seed: int = 0):
+        """Train the IVF outside the lock and install it unless rows moved meanwhile."""
+        try:
+            with self._lock:
+                vectors, generation = self._vectors, self._ivf_generation
+            size = len(vectors)
+            centroids, lists = _train_ivf(np.asarray(vectors), iterations, seed)
+            with self._lock:
+                if generation != self._ivf_generation:
+                    return  # a later query schedules a fresh build
+                self._centroids, self._lists, self._ivf_size = centroids, lists, size
+                self._extend_ann(size)  # rows appended while training
+            logger.info(f"Built IVF index: {len(lists)} lists over {size} vectors")
+        except Exception:
+            logger.exception("IVF build failed")
+        finally:
+            self._ivf_building = False
+
+
+def _train_ivf(
+    vectors: np.ndarray, iterations: int, seed: int
+) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """Cluster the vectors with spherical k-means (nlist ~ sqrt(n))."""
+    n = len(vectors)
+    nlist = max(1, int(np.sqrt(n)))
+    rng = np.random.default_rng(seed)
+
+    # Train on a sample to keep build time bounded for very large indexes
+    sample_size = min(n, nlist * 64)
+    sample = vectors[rng.choice(n, size=sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+
+    assign = np.argmax(vectors @ centroids.T, axis=1)
+    return centroids, [np.flatnonzero(assign == c) for c in range(nlist)]
+
+
+def _probe(ivf: Tuple[np.ndarray, List[np.ndarray]], q: np.ndarray, nprobe: int) -> np.ndarray:
+    """Rows in the ``nprobe`` lists whose centroids are closest to ``q``."""
+    centroids, lists = ivf
+    probe = _top_k(centroids @ q, min(nprobe, len(centroids)))
+    return np.concatenate([lists[c] for c in probe])
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` largest scores, sorted descending (O(n) partition + O(k log k) sort)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(len(scores))
+    return part[np.argsort(-scores[part], kind="stable")]
@@ -0,0 +1,143 @@
+"""
+Prometheus metrics.
+Metric definitions shared by both apps, built on prometheus_client. When
+PROMETHEUS_MULTIPROC_DIR is set (gunicorn.conf.py sets it), every worker
+writes its samples there and /metrics aggregates all workers.
+"""
+
+import os
+import time
+from typing import Any, Optional, Sequence
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from services.tokens import estimate_tokens
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Seconds; spans cache hits (sub-ms) through slow LLM completions
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Upstream calls
+EMBED_LATENCY = Histogram(
+    "clinicbot_embedding_request_seconds",
+    "Latency of embedding API calls (cache misses only).",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+VECTOR_QUERY_LATENCY = Histogram(
+    "clinicbot_vector_query_seconds",
+    "Latency of vector index queries.",
+    ["backend"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Pipeline
+STAGE_LATENCY = Histogram(
+    "clinicbot_pipeline_stage_seconds",
+    "Latency of RAG pipeline stages (embed, retrieve, assemble, generate, answer).",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+ANSWERS = Counter(
+    "clinicbot_answers_total",
+    "Answers produced, by how they were served (cache, faq or rag).",
+    ["served_from"],
+)
+
+# Caches and request coalescing
+CACHE_HITS = Counter("clinicbot_cache_hits_total", "Cache hits.", ["cache"])
+CACHE_MISSES = Counter("clinicbot_cache_misses_total", "Cache misses.", ["cache"])
+COALESCED = Counter(
+    "clinicbot_coalesced_requests_total",
+    "Requests that shared an identical in-flight pipeline run.",
+    ["mode"],
+)
+
+# LLM
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "clinicbot_llm_time_to_first_token_seconds",
+    "Time from the LLM request to its first streamed token.",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_GENERATION = Histogram(
+    "clinicbot_llm_generation_seconds",
+    "Total LLM generation time.",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "clinicbot_llm_tokens_per_second",
+    "Completion tokens per second of generation time.",
+    ["endpoint"],
+    buckets=(5, 10, 25, 50, 100, 200, 400, 800, 1600, 3200),
+)
+LLM_TOKENS = Counter(
+    "clinicbot_llm_tokens_total",
+    "LLM prompt and completion tokens (provider usage when reported, otherwise estimated).",
+    ["endpoint", "kind"],
+)
+
+# Errors
+ERRORS = Counter(
+    "clinicbot_errors_total",
+    "Failed requests, including errors raised mid-stream.",
+    ["endpoint"],
+)
+
+
+def observe_llm(
+    endpoint: str,
+    elapsed: float,
+    prompt_tokens: int,
+    completion_tokens: int,
+    time_to_first_token: Optional[float] = None,
+):
+    """Record one LLM generation."""
+    LLM_GENERATION.labels(endpoint=endpoint).observe(elapsed)
+    if time_to_first_token is not None:
+        LLM_TIME_TO_FIRST_TOKEN.labels(endpoint=endpoint).observe(time_to_first_token)
+    LLM_TOKENS.labels(endpoint=endpoint, kind="prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(endpoint=endpoint, kind="completion").inc(completion_tokens)
+    # Rate over the streaming phase when known, otherwise the whole call
+    duration = elapsed - (time_to_first_token or 0.0)
+    if completion_tokens and duration > 0:
+        LLM_TOKENS_PER_SECOND.labels(endpoint=endpoint).observe(completion_tokens / duration)
+
+
+class LLMStreamTimer:
+    """Times one streamed LLM generation; call mark_token() for every token received."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+
+    def mark_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def finish(self, prompt: Sequence[Any], completion: str):
+        """Record the generation with estimated token counts for the prompt messages and completion."""
+        elapsed = time.perf_counter() - self.started
+        ttft = None if self.first_token_at is None else self.first_token_at - self.started
+        prompt_tokens = sum(estimate_tokens(str(getattr(message, "content", message))) for message in prompt)
+        observe_llm(self.endpoint, elapsed, prompt_tokens, estimate_tokens(completion), ttft)
+
+
+def render_metrics() -> bytes:
+    """Current metrics in the Prometheus text format, aggregated over all workers in multiprocess mode."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
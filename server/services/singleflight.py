@@ -0,0 +1,116 @@
+"""
+Single-flight request coalescing.
+Concurrent calls with the same key share one in-flight computation and all
+receive its result (or its exception), so upstream load during a burst scales
+with the number of distinct keys rather than the number of callers.
+"""
+
+import asyncio
+from threading import Event, Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """One in-flight computation shared by a leader thread and its followers."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Thread-based coalescing (Flask / worker threads).
+
+    Args:
+        on_shared: Optional callback run whenever a call joins one in flight
+    """
+
+    def __init__(self, on_shared: Optional[Callable[[], None]] = None):
+        self.on_shared = on_shared
+        self._lock = Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._executed = 0
+        self._shared = 0
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run ``func(*args, **kwargs)`` unless a call with the same key is in flight,
+        in which case wait for that call and return its result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+            else:
+                self._shared += 1
+
+        if not leader:
+            if self.on_shared is not None:
+                self.on_shared()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls), "executed": self._executed, "shared": self._shared}
+
+
+class AsyncSingleFlight:
+    """
+    asyncio-based coalescing (FastAPI).
+
+    The computation runs as its own task and every caller awaits it through
+    ``asyncio.shield``, so a caller that disconnects does not cancel the work
+    the others are waiting for.
+
+    Args:
+        on_shared: Optional callback run whenever a call joins one in flight
+    """
+
+    def __init__(self, on_shared: Optional[Callable[[], None]] = None):
+        self.on_shared = on_shared
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self._executed = 0
+        self._shared = 0
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await ``func(*args, **kwargs)``, sharing an in-flight call with the same key."""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._tasks[key] = task
+            self._executed += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._shared += 1
+            if self.on_shared is not None:
+                self.on_shared()
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark the exception retrieved when every caller went away before it finished
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._tasks), "executed": self._executed, "shared": self._shared}
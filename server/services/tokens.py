@@ -0,0 +1,10 @@
+"""
+Token estimates.
+A cheap character-based estimate used for context packing, conversation
+budgets and token metrics when the provider does not report usage.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token plus per-message overhead)."""
+    return len(text) // 4 + 4
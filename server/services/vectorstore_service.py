@@ -1,49 +1,123 @@
 """
 Centralized VectorStore Service for Pinecone operations.
 Provides singleton access to Pinecone client, index, and embedding model.
+The index backend (Pinecone or a local in-process index) is selected via settings.VECTOR_BACKEND.
 """
 
 from functools import lru_cache
-from typing import List, Dict, Any
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future
+from collections import deque
+from typing import TYPE_CHECKING, List, Dict, Any, Callable, Optional, Tuple
+import asyncio
+import atexit
+import hashlib
+import json
+import re
 import time
 
-from pinecone import Pinecone, ServerlessSpec
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_core.documents import Document
 
 from config import settings
 from logger import logger
+from services.local_index import LocalVectorIndex
+from services.embedding_cache import QUERY_TASK_TYPE, EmbeddingCache, normalize_query
+from services.metrics import EMBED_LATENCY, VECTOR_QUERY_LATENCY
+from services.ingest_manifest import IngestManifest
+
+# pinecone and langchain_google_genai take most of the app's import time;
+# they are imported when the client / embedding model is first created
+if TYPE_CHECKING:
+    from pinecone import Pinecone
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+VECTOR_BACKENDS = ("pinecone", "local")
+
+# Prefixes ingested as "{prefix}-{n}" before vector IDs became content hashes
+LEGACY_ID_PREFIXES = ("pdf", "doc")
+POSITIONAL_IDS_MIGRATION = "delete-positional-ids"
+_POSITIONAL_ID = re.compile(r"[a-z]+-\d{1,9}")  # hash IDs are 32 hex chars
 
 
 class VectorStoreService:
     """Centralized service for Pinecone vector store operations."""
     
-    def __init__(self):
+    def __init__(self, backend: str = None):
+        self.backend = backend or settings.VECTOR_BACKEND
+        if self.backend not in VECTOR_BACKENDS:
+            raise ValueError(
+                f"Unknown VECTOR_BACKEND '{self.backend}', expected one of {VECTOR_BACKENDS}"
+            )
         self._pc = None
         self._index = None
+        self._async_index = None
         self._embed_model = None
+        self.embedding_cache = EmbeddingCache(
+            max_size=settings.EMBEDDING_CACHE_SIZE,
+            ttl=settings.EMBEDDING_CACHE_TTL,
+            path=settings.EMBEDDING_CACHE_PATH,
+        )
+        self._ingest_listeners: List[Callable[[], None]] = []
+        self.manifest = IngestManifest(settings.INGEST_MANIFEST_PATH)
+        # id_prefix -> whether the index holds vectors outside it (see has_documents_outside)
+        self._outside: Dict[str, bool] = {}
     
     @property
-    def client(self) -> Pinecone:
+    def client(self) -> "Pinecone":
         """Lazy-loaded Pinecone client (singleton)."""
         if self._pc is None:
+            from pinecone import Pinecone
             logger.info("Initializing Pinecone client")
             self._pc = Pinecone(api_key=settings.PINECONE_API_KEY)
         return self._pc
     
     @property
     def index(self):
-        """Lazy-loaded Pinecone index (singleton)."""
+        """Lazy-loaded vector index (singleton): Pinecone index or LocalVectorIndex."""
         if self._index is None:
-            logger.info(f"Connecting to Pinecone index: {settings.PINECONE_INDEX_NAME}")
-            self._index = self.client.Index(settings.PINECONE_INDEX_NAME)
+            if self.backend == "local":
+                logger.info(f"Opening local vector index at: {settings.LOCAL_INDEX_PATH}")
+                self._index = LocalVectorIndex(
+                    dimension=settings.EMBEDDING_DIMENSION,
+                    path=settings.LOCAL_INDEX_PATH,
+                    ann=settings.LOCAL_INDEX_ANN,
+                    ann_min_size=settings.LOCAL_INDEX_ANN_MIN_SIZE,
+                    nprobe=settings.LOCAL_INDEX_NPROBE,
+                )
+                # Writes are persisted once per ingest; also keep any direct writes on exit
+                atexit.register(self._index.flush)
+            else:
+                logger.info(f"Connecting to Pinecone index: {settings.PINECONE_INDEX_NAME}")
+                self._index = self.client.Index(settings.PINECONE_INDEX_NAME)
         return self._index
     
+    async def get_async_index(self):
+        """
+        Lazy-loaded asyncio Pinecone index (singleton).
+        
+        Returns None for the local backend, whose in-process queries never block.
+        """
+        if self.backend == "local":
+            return None
+        if self._async_index is None:
+            logger.info(f"Connecting asyncio client to Pinecone index: {settings.PINECONE_INDEX_NAME}")
+            # describe_index is a blocking HTTP call; keep it off the event loop
+            description = await asyncio.to_thread(
+                self.client.describe_index, settings.PINECONE_INDEX_NAME
+            )
+            self._async_index = self.client.IndexAsyncio(host=description.host)
+        return self._async_index
+    
+    async def aclose(self):
+        """Close the asyncio Pinecone index session, if one was opened."""
+        if self._async_index is not None:
+            await self._async_index.close()
+            self._async_index = None
+    
     @property
-    def embed_model(self) -> GoogleGenerativeAIEmbeddings:
+    def embed_model(self) -> "GoogleGenerativeAIEmbeddings":
         """Lazy-loaded embedding model (singleton)."""
         if self._embed_model is None:
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
             logger.info(f"Initializing embedding model: {settings.EMBEDDING_MODEL}")
             self._embed_model = GoogleGenerativeAIEmbeddings(
                 model=settings.EMBEDDING_MODEL,
@@ -51,102 +125,449 @@ class VectorStoreService:
             )
         return self._embed_model
     
-    def query(self, text: str, top_k: int = 3) -> List[Document]:
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query, served from the embedding cache when possible.
+        
+        Args:
+            text: Query text to embed
+            
+        Returns:
+            Embedding vector
+        """
+        return self.embedding_cache.get_or_compute(
+            text, settings.EMBEDDING_MODEL, self._embed_uncached, QUERY_TASK_TYPE
+        )
+    
+    def _embed_uncached(self, text: str) -> List[float]:
+        with EMBED_LATENCY.labels(operation="embed_query").time():
+            return self.embed_model.embed_query(text, task_type=QUERY_TASK_TYPE)
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several queries, batching every cache miss into one embed_documents call.
+        
+        The batch is embedded with the query task type, so the vectors match
+        embed_query and share its cache entries.
+        
+        Texts that normalize to the same query are embedded once, even when the
+        embedding cache is disabled.
+        
+        Args:
+            texts: Query texts to embed
+            
+        Returns:
+            Embedding vectors in input order
+        """
+        model = settings.EMBEDDING_MODEL
+        embeddings = [self.embedding_cache.get(text, model, QUERY_TASK_TYPE) for text in texts]
+        missing: Dict[str, List[int]] = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(normalize_query(texts[i]), []).append(i)
+        if missing:
+            positions = list(missing.values())
+            with EMBED_LATENCY.labels(operation="embed_documents").time():
+                computed = self.embed_model.embed_documents(
+                    [texts[rows[0]] for rows in positions], task_type=QUERY_TASK_TYPE
+                )
+            for rows, embedding in zip(positions, computed):
+                for i in rows:
+                    embeddings[i] = embedding
+                self.embedding_cache.put(texts[rows[0]], model, embedding, QUERY_TASK_TYPE)
+        return embeddings
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async variant of embed_query using the embedding model's async client."""
+        embedding = await self.embedding_cache.aget(text, settings.EMBEDDING_MODEL, QUERY_TASK_TYPE)
+        if embedding is None:
+            with EMBED_LATENCY.labels(operation="embed_query").time():
+                embedding = await self.embed_model.aembed_query(text, task_type=QUERY_TASK_TYPE)
+            await self.embedding_cache.aput(text, settings.EMBEDDING_MODEL, embedding, QUERY_TASK_TYPE)
+        return embedding
+    
+    def add_ingest_listener(self, callback: Callable[[], None]):
+        """Register a callback invoked after the index contents change (e.g. cache invalidation)."""
+        self._ingest_listeners.append(callback)
+    
+    def _notify_ingest(self):
+        for callback in self._ingest_listeners:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Ingest listener failed")
+    
+    def query(
+        self,
+        text: str,
+        top_k: int = 3,
+        filter: Optional[Dict[str, Any]] = None,
+        embedding: Optional[List[float]] = None
+    ) -> List[Document]:
         """
         Query vector store and return documents.
         
         Args:
             text: Query text to search for
             top_k: Number of top results to return
+            filter: Optional metadata filter (Pinecone filter syntax)
+            embedding: Precomputed embedding of ``text`` (skips embedding it again)
             
         Returns:
             List of LangChain Document objects with relevant content
         """
-        logger.debug(f"Querying vector store for: {text[:50]}...")
+        logger.debug("Querying vector store for: %.50s...", text)
         
-        # Embed the query
-        embedded_query = self.embed_model.embed_query(text)
+        # Embed the query unless the caller already did
+        embedded_query = self.embed_query(text) if embedding is None else embedding
         
-        # Query Pinecone
-        res = self.index.query(
-            vector=embedded_query,
-            top_k=top_k,
-            include_metadata=True
-        )
+        # Query the index
+        with VECTOR_QUERY_LATENCY.labels(backend=self.backend).time():
+            res = self.index.query(
+                vector=embedded_query,
+                top_k=top_k,
+                include_metadata=True,
+                filter=filter
+            )
+        
+        return self._matches_to_documents(res)
+    
+    async def aquery(
+        self,
+        text: str,
+        top_k: int = 3,
+        filter: Optional[Dict[str, Any]] = None,
+        embedding: Optional[List[float]] = None
+    ) -> List[Document]:
+        """
+        Async variant of query: async embedding and asyncio Pinecone client.
         
-        # Convert to LangChain documents
+        Args:
+            text: Query text to search for
+            top_k: Number of top results to return
+            filter: Optional metadata filter (Pinecone filter syntax)
+            embedding: Precomputed embedding of ``text`` (skips embedding it again)
+            
+        Returns:
+            List of LangChain Document objects with relevant content
+        """
+        logger.debug("Async querying vector store for: %.50s...", text)
+        
+        embedded_query = await self.aembed_query(text) if embedding is None else embedding
+        
+        async_index = await self.get_async_index()
+        with VECTOR_QUERY_LATENCY.labels(backend=self.backend).time():
+            if async_index is not None:
+                res = await async_index.query(
+                    vector=embedded_query,
+                    top_k=top_k,
+                    include_metadata=True,
+                    filter=filter
+                )
+            else:
+                res = self.index.query(
+                    vector=embedded_query,
+                    top_k=top_k,
+                    include_metadata=True,
+                    filter=filter
+                )
+        
+        return self._matches_to_documents(res)
+    
+    @staticmethod
+    def _matches_to_documents(res) -> List[Document]:
+        """Convert index query matches to LangChain documents."""
         docs = []
         for match in res["matches"]:
             text_content = match["metadata"].get("text", "")
             score = match.get("score", 0.0)
             
-            logger.debug(f"Match score: {score:.4f}, Text length: {len(text_content)}")
+            logger.debug("Match score: %.4f, Text length: %d", score, len(text_content))
             
             if text_content:  # Only add documents with content
                 docs.append(
                     Document(
                         page_content=text_content,
-                        metadata=match["metadata"]
+                        metadata={**match["metadata"], "score": score}
                     )
                 )
         
-        logger.debug(f"Retrieved {len(docs)} documents with content")
+        logger.debug("Retrieved %d documents with content", len(docs))
         return docs
     
     def upsert_documents(
         self, 
         documents: List[Document], 
-        id_prefix: str = "doc"
+        id_prefix: str = "doc",
+        progress: Optional[Callable[[int, int], None]] = None,
+        prune: bool = False,
+        force: bool = False
     ) -> int:
         """
-        Upsert documents to vector store.
+        Idempotently upsert documents to vector store.
+        
+        Vector IDs are derived from a hash of the chunk text, so identical
+        chunks map to the same vector. The ingest manifest records what was
+        already written under ``id_prefix``: unchanged chunks are skipped,
+        metadata-only changes are applied without re-embedding, and only new
+        texts are embedded.
         
         Args:
             documents: List of LangChain Document objects to upsert
-            id_prefix: Prefix for document IDs
+            id_prefix: Prefix for document IDs (one manifest entry per prefix)
+            progress: Optional callback receiving (upserted_count, total_count)
+            prune: Delete vectors previously ingested under ``id_prefix`` that
+                are no longer present in ``documents``
+            force: Ignore the manifest and re-embed every document
             
         Returns:
-            Number of documents upserted
+            Number of documents embedded or updated
         """
-        if not documents:
+        if not documents and not prune:
             logger.warning("No documents to upsert")
             return 0
         
-        logger.info(f"Upserting {len(documents)} documents to vector store")
-        
-        # Extract text and metadata
-        texts = [doc.page_content for doc in documents]
-        metadatas = []
+        # Deterministic content-hash IDs; duplicate texts collapse to one vector
+        chunks: Dict[str, Tuple[str, Dict[str, Any], str]] = {}
         for doc in documents:
+            id_val = f"{id_prefix}-{_content_hash(doc.page_content)}"
+            if id_val in chunks:
+                continue
             metadata = doc.metadata.copy()
             # Ensure text is in metadata for retrieval
             metadata["text"] = doc.page_content
-            metadatas.append(metadata)
+            chunks[id_val] = (doc.page_content, metadata, _metadata_hash(metadata))
         
-        ids = [f"{id_prefix}-{i}" for i in range(len(documents))]
+        scope = self._manifest_scope()
+        self._delete_positional_ids(scope)
+        recorded = self.manifest.get(scope, id_prefix)
+        previous = {} if force else recorded
         
-        # Generate embeddings
-        logger.debug("Generating embeddings...")
-        embeddings = self.embed_model.embed_documents(texts)
-        
-        # Prepare vectors for upsert
-        vectors = [
-            (id_val, embedding, metadata)
-            for id_val, embedding, metadata in zip(ids, embeddings, metadatas)
+        new_ids = [id_val for id_val in chunks if id_val not in previous]
+        changed_ids = [
+            id_val for id_val in chunks
+            if id_val in previous and previous[id_val] != chunks[id_val][2]
         ]
+        stale_ids = [id_val for id_val in recorded if id_val not in chunks] if prune else []
+        
+        logger.info(
+            f"Ingest '{id_prefix}': {len(documents)} documents, {len(chunks)} unique, "
+            f"{len(new_ids)} new, {len(changed_ids)} metadata changes, {len(stale_ids)} stale"
+        )
+        
+        written = 0
+        if new_ids:
+            written += self._upsert_vectors(
+                new_ids,
+                [chunks[id_val][0] for id_val in new_ids],
+                [chunks[id_val][1] for id_val in new_ids],
+                progress=progress,
+            )
+        
+        for id_val in changed_ids:
+            self._with_retries(
+                self.index.update, id=id_val, set_metadata=chunks[id_val][1],
+                description=f"metadata update of {id_val}"
+            )
+            written += 1
+        
+        delete_batch_size = max(1, settings.UPSERT_BATCH_SIZE)
+        for offset in range(0, len(stale_ids), delete_batch_size):
+            batch = stale_ids[offset:offset + delete_batch_size]
+            self._with_retries(
+                self.index.delete, ids=batch,
+                description=f"delete of {len(batch)} stale vectors"
+            )
+        
+        if self.backend == "local":
+            # One snapshot write per ingest instead of one per batch
+            self.index.flush()
+        
+        # Without pruning, vectors recorded earlier are still in the index (even when forced)
+        entries = {} if prune else recorded
+        entries.update({id_val: chunk[2] for id_val, chunk in chunks.items()})
+        self.manifest.set(scope, id_prefix, entries)
         
-        # Upsert to Pinecone
-        logger.debug("Upserting to Pinecone...")
-        self.index.upsert(vectors=vectors)
+        if written or stale_ids:
+            self._refresh_outside(id_prefix if entries else None)
+            self._notify_ingest()
         
-        logger.info(f"✅ Successfully upserted {len(vectors)} documents")
-        return len(vectors)
+        logger.info(f"✅ Ingest '{id_prefix}' complete: {written} written, {len(stale_ids)} deleted")
+        return written
+    
+    def _upsert_vectors(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> int:
+        """
+        Embed and upsert vectors in batches.
+        
+        Embedding batches run on a bounded thread pool so that embedding of
+        batch N+1 overlaps the upsert of batch N. Every embed and upsert call
+        is retried with exponential backoff.
+        """
+        total = len(ids)
+        
+        embed_batch_size = max(1, settings.EMBED_BATCH_SIZE)
+        upsert_batch_size = max(1, settings.UPSERT_BATCH_SIZE)
+        max_workers = max(1, settings.INGEST_MAX_WORKERS)
+        
+        upserted = 0
+        
+        def embed_batch(start: int) -> Tuple[int, List[List[float]]]:
+            batch = texts[start:start + embed_batch_size]
+            embeddings = self._with_retries(
+                self.embed_model.embed_documents, batch,
+                description=f"embed batch {start}-{start + len(batch)}"
+            )
+            return start, embeddings
+        
+        def upsert_batch(vectors: List[tuple]) -> int:
+            self._with_retries(
+                self.index.upsert, vectors=vectors,
+                description=f"upsert of {len(vectors)} vectors"
+            )
+            return len(vectors)
+        
+        def drain(futures: "deque[Future]", limit: int):
+            nonlocal upserted
+            while len(futures) > limit:
+                upserted += futures.popleft().result()
+                logger.info(f"Upsert progress: {upserted}/{total}")
+                if progress is not None:
+                    progress(upserted, total)
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest") as pool:
+            embed_futures: "deque[Future]" = deque()
+            upsert_futures: "deque[Future]" = deque()
+            starts = iter(range(0, total, embed_batch_size))
+            
+            # Keep a bounded window of embedding batches in flight
+            for start in starts:
+                embed_futures.append(pool.submit(embed_batch, start))
+                if len(embed_futures) >= max_workers:
+                    break
+            
+            while embed_futures:
+                start, embeddings = embed_futures.popleft().result()
+                next_start = next(starts, None)
+                if next_start is not None:
+                    embed_futures.append(pool.submit(embed_batch, next_start))
+                
+                vectors = [
+                    (ids[start + i], embedding, metadatas[start + i])
+                    for i, embedding in enumerate(embeddings)
+                ]
+                for offset in range(0, len(vectors), upsert_batch_size):
+                    upsert_futures.append(
+                        pool.submit(upsert_batch, vectors[offset:offset + upsert_batch_size])
+                    )
+                drain(upsert_futures, max_workers)
+            
+            drain(upsert_futures, 0)
+        
+        logger.info(f"✅ Successfully upserted {upserted} documents")
+        return upserted
+    
+    def _delete_positional_ids(self, scope: str):
+        """
+        One-time migration: delete vectors written under the old positional IDs.
+
+        Before content-hash IDs, chunks were stored as ``{id_prefix}-{n}``. Those
+        vectors are not in the manifest, so nothing else would ever remove them.
+        """
+        if self.manifest.migrated(scope, POSITIONAL_IDS_MIGRATION):
+            return
+        
+        stale_ids = []
+        try:
+            for prefix in LEGACY_ID_PREFIXES:
+                for page in self.index.list(prefix=f"{prefix}-"):
+                    stale_ids.extend(id_val for id_val in page if _POSITIONAL_ID.fullmatch(id_val))
+        except Exception:
+            # Pod-based Pinecone indexes cannot list IDs; retried on the next ingest
+            logger.warning("Could not list vector IDs; positional IDs from older ingests were not removed")
+            return
+        
+        delete_batch_size = max(1, settings.UPSERT_BATCH_SIZE)
+        for offset in range(0, len(stale_ids), delete_batch_size):
+            batch = stale_ids[offset:offset + delete_batch_size]
+            self._with_retries(
+                self.index.delete, ids=batch,
+                description=f"delete of {len(batch)} positional-ID vectors"
+            )
+        self.manifest.mark_migrated(scope, POSITIONAL_IDS_MIGRATION)
+        if stale_ids:
+            logger.info(f"Deleted {len(stale_ids)} vectors with positional IDs from older ingests")
+            self._refresh_outside()
+            self._notify_ingest()
+    
+    def has_documents_outside(self, id_prefix: str) -> bool:
+        """
+        True when the index holds vectors that were not ingested under ``id_prefix``.
+        
+        Read from the index on first use (warm-up does this) and kept up to date
+        by ingestion, so checking it per request does no I/O.
+        """
+        outside = self._outside.get(id_prefix)
+        if outside is None:
+            outside = self._outside[id_prefix] = self._count_outside(id_prefix)
+        return outside
+    
+    def _count_outside(self, id_prefix: str) -> bool:
+        try:
+            total = self.index.describe_index_stats()["total_vector_count"]
+            try:
+                inside = sum(len(page) for page in self.index.list(prefix=f"{id_prefix}-"))
+            except Exception:
+                # Pod-based Pinecone indexes cannot list IDs
+                inside = len(self.manifest.get(self._manifest_scope(), id_prefix))
+        except Exception as e:
+            logger.warning(f"Could not read index stats ({e}); assuming documents outside '{id_prefix}'")
+            return True
+        return total > inside
+    
+    def _refresh_outside(self, written_prefix: Optional[str] = None):
+        """Update has_documents_outside after an ingest that left vectors under ``written_prefix``."""
+        for prefix in list(self._outside):
+            if written_prefix is not None and prefix != written_prefix:
+                # Pinecone stats can lag behind a write; these vectors are known to exist
+                self._outside[prefix] = True
+            else:
+                self._outside[prefix] = self._count_outside(prefix)
+    
+    def _manifest_scope(self) -> str:
+        if self.backend == "local":
+            return f"local:{settings.LOCAL_INDEX_PATH}"
+        return f"pinecone:{settings.PINECONE_INDEX_NAME}"
+    
+    @staticmethod
+    def _with_retries(func: Callable, *args, description: str = "operation", **kwargs):
+        """Call func, retrying with exponential backoff on failure."""
+        max_retries = settings.INGEST_MAX_RETRIES
+        for attempt in range(max_retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt == max_retries:
+                    logger.error(f"{description} failed after {attempt + 1} attempts: {e}")
+                    raise
+                delay = settings.INGEST_RETRY_BACKOFF * (2 ** attempt)
+                logger.warning(f"{description} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
     
     def ensure_index_exists(self):
         """
         Ensure Pinecone index exists, create if not.
         This is typically called during initialization scripts.
         """
+        if self.backend == "local":
+            logger.info(f"Using local vector index: {settings.LOCAL_INDEX_PATH}")
+            return
+
         logger.info("Checking if Pinecone index exists...")
         
         existing_indexes = [i["name"] for i in self.client.list_indexes()]
@@ -154,6 +575,7 @@ class VectorStoreService:
         if settings.PINECONE_INDEX_NAME not in existing_indexes:
             logger.info(f"Creating new Pinecone index: {settings.PINECONE_INDEX_NAME}")
             
+            from pinecone import ServerlessSpec
             spec = ServerlessSpec(
                 cloud="aws",
                 region=settings.PINECONE_ENV,
@@ -180,6 +602,17 @@ class VectorStoreService:
         return self.index.describe_index_stats()
 
 
+def _content_hash(text: str) -> str:
+    """Deterministic vector ID component derived from the chunk text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def _metadata_hash(metadata: Dict[str, Any]) -> str:
+    return hashlib.sha256(
+        json.dumps(metadata, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+
+
 @lru_cache()
 def get_vectorstore_service() -> VectorStoreService:
     """Get singleton VectorStore service instance."""